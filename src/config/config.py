@@ -1,3 +1,6 @@
+# Schema configuration: table -> column names, loaded from data/schema.json
+from src.database.schema import REGISTRY as SCHEMA
+
 # Database configuration
 DB_PATH = "medical.db"
 LOG_DIR = "logs"
@@ -22,13 +25,4 @@ QUERY_TIMEOUT_SEC = 30
 
 # Logging configuration
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-LOG_LEVEL = "INFO"
-
-# Schema configuration (matches schema.json)
-SCHEMA = {
-    "patients": ["patient_id", "name", "age", "gender"],
-    "doctors": ["doctor_id", "name", "specialty"],
-    "medications": ["med_id", "name", "manufacturer"],
-    "appointments": ["appt_id", "patient_id", "doctor_id", "date", "reason"],
-    "prescriptions": ["presc_id", "patient_id", "med_id", "dosage", "date"]
-}
\ No newline at end of file
+LOG_LEVEL = "INFO"
\ No newline at end of file
@@ -1,23 +1,69 @@
 """Database helper functions: connect, sanitize, execute SELECT-only queries.
 
 This module enforces that only safe SELECT statements are executed. It returns
-rows and column names.
+rows and column names. Queries run on read-only pooled connections whose
+authorizer makes SQLite itself reject any statement that would write, so
+`execute_select` does not pre-scan the SQL; `is_safe_select` stays available
+for validating SQL without running it.
 """
+import functools
+import itertools
 import re
 import sqlite3
-from typing import List, Tuple
+import string
+from contextlib import contextmanager
+from typing import Iterator, List, Tuple
 
+from .pool import get_pool
 
-_FORBIDDEN = re.compile(r"\b(INSERT|UPDATE|DELETE|DROP|ALTER|CREATE|ATTACH|DETACH|PRAGMA|EXEC|REPLACE|TRUNCATE|MERGE|BEGIN|COMMIT|ROLLBACK)\b", re.I)
+# Rows pulled from SQLite per fetchmany() call
+FETCH_BATCH_SIZE = 200
+
+_SELECT_PREFIX_RE = re.compile(r"^(\(|\s)*SELECT\b", re.I)
+
+_FORBIDDEN_SET = frozenset((
+    "INSERT", "UPDATE", "DELETE", "DROP", "ALTER", "CREATE", "ATTACH", "DETACH",
+    "PRAGMA", "EXEC", "REPLACE", "TRUNCATE", "MERGE", "BEGIN", "COMMIT", "ROLLBACK",
+))
+_WORD_CHARS = frozenset(string.ascii_uppercase + string.digits + "_")
+
+
+def _contains_word(upper_sql: str, word: str) -> bool:
+    """Return True if `word` occurs in `upper_sql` as a whole word.
+
+    Only called after a plain substring hit, so e.g. `created_at` costs one
+    extra find() rather than a regex search on every query.
+    """
+    start = upper_sql.find(word)
+    while start != -1:
+        end = start + len(word)
+        if upper_sql[start - 1:start] not in _WORD_CHARS and upper_sql[end:end + 1] not in _WORD_CHARS:
+            return True
+        start = upper_sql.find(word, start + 1)
+    return False
 
 
 def is_safe_select(sql: str) -> Tuple[bool, str]:
-    """Return (allowed, normalized_sql). Only allow SELECT statements and disallow dangerous keywords.
+    """Return (allowed, normalized_sql). Only allow a single SELECT statement without
+    comments or dangerous keywords.
+
+    The returned SQL is stripped and has a trailing semicolon removed. The
+    keyword check is defence in depth for callers that validate SQL without
+    running it through `execute_select`, whose read-only authorizer is the
+    actual guarantee.
 
-    The returned SQL is stripped and has a trailing semicolon removed.
+    Results are memoized per SQL string, since generated queries tend to repeat.
     """
     if not sql or not isinstance(sql, str):
         return False, ""
+    return _is_safe_select_cached(sql)
+
+
+# The check is pure over its input; 512 entries of (bool, str) cost roughly
+# 100KB and make validation of repeated queries a dict lookup
+@functools.lru_cache(maxsize=512)
+def _is_safe_select_cached(sql: str) -> Tuple[bool, str]:
+    """Uncached body of `is_safe_select` for a non-empty string."""
     s = sql.strip()
     # remove trailing semicolons
     if s.endswith(";"):
@@ -25,27 +71,89 @@ def is_safe_select(sql: str) -> Tuple[bool, str]:
     # disallow SQL comments
     if "--" in s or "/*" in s:
         return False, s
-    if _FORBIDDEN.search(s):
+    # disallow multiple statements
+    if ";" in s:
         return False, s
-    # Allow only statements starting with SELECT (optionally with parentheses)
-    if re.match(r"^(\(|\s)*SELECT\b", s, re.I):
+    # uppercase once and run every keyword test against that copy
+    u = s.upper()
+    for kw in _FORBIDDEN_SET:
+        if kw in u and _contains_word(u, kw):
+            return False, s
+    # Allow only statements starting with SELECT (optionally with parentheses).
+    # The plain "SELECT ..." case is decided without touching the regex engine.
+    if u[:6] == "SELECT":
+        nxt = s[6:7]
+        return not (nxt.isalnum() or nxt == "_"), s
+    if s.startswith("(") and _SELECT_PREFIX_RE.match(s):
         return True, s
     return False, s
 
 
-def execute_select(db_path: str, sql: str, params: Tuple = ()) -> Tuple[List[str], List[Tuple]]:
-    """Execute a sanitized SELECT and return (columns, rows).
+@contextmanager
+def _select_cursor(db_path: str, sql: str, params: Tuple) -> Iterator[sqlite3.Cursor]:
+    """Run `sql` on a read-only pooled connection and yield the cursor.
 
-    Raises ValueError if SQL is not a safe SELECT.
+    No Python-side parsing happens here: the connection's authorizer denies
+    anything but reads while SQLite prepares the statement, and SQLite itself
+    refuses multiple statements.
     """
-    ok, norm = is_safe_select(sql)
-    if not ok:
+    if not sql or not isinstance(sql, str):
         raise ValueError("Only safe SELECT statements are allowed")
+    norm = sql.strip()
+    if norm.endswith(";"):
+        norm = norm[:-1].strip()
 
-    conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
-    cur.execute(norm, params)
-    rows = cur.fetchall()
-    columns = [desc[0] for desc in cur.description] if cur.description else []
-    conn.close()
+    try:
+        with get_pool(db_path, read_only=True).connection() as conn:
+            cur = conn.execute_cached(norm, params)
+            try:
+                if cur.description is None:
+                    # e.g. a comment-only string: nothing was selected
+                    raise ValueError("Only safe SELECT statements are allowed")
+                cur.arraysize = FETCH_BATCH_SIZE
+                yield cur
+            finally:
+                # A result read only in part keeps its statement, and with it
+                # a read transaction on an old snapshot, open until the
+                # cursor is reset
+                try:
+                    unfinished = cur.fetchone() is not None
+                except sqlite3.Error:
+                    unfinished = True
+                if unfinished:
+                    conn.discard_cached(norm)
+    except sqlite3.DatabaseError as e:
+        if "not authorized" in str(e):
+            raise ValueError("Only safe SELECT statements are allowed") from e
+        raise ValueError(f"Query failed: {e}") from e
+
+
+def _iter_rows(cur: sqlite3.Cursor) -> Iterator[Tuple]:
+    """Yield rows from `cur`, fetching them in batches of `cur.arraysize`."""
+    while True:
+        batch = cur.fetchmany()
+        if not batch:
+            return
+        yield from batch
+
+
+def execute_select_iter(db_path: str, sql: str, params: Tuple = ()) -> Iterator[Tuple]:
+    """Execute a read-only query and yield its rows as they are fetched.
+
+    The pooled connection stays borrowed until the iterator is exhausted or closed.
+    Raises ValueError if SQL is not a read-only query or SQLite rejects it.
+    """
+    with _select_cursor(db_path, sql, params) as cur:
+        yield from _iter_rows(cur)
+
+
+def execute_select(db_path: str, sql: str, params: Tuple = (), max_rows: int = 1000) -> Tuple[List[str], List[Tuple]]:
+    """Execute a read-only query and return (columns, rows).
+
+    At most `max_rows` rows are fetched from SQLite.
+    Raises ValueError if SQL is not a read-only query or SQLite rejects it.
+    """
+    with _select_cursor(db_path, sql, params) as cur:
+        columns = [desc[0] for desc in cur.description] if cur.description else []
+        rows = list(itertools.islice(_iter_rows(cur), max_rows))
     return columns, rows
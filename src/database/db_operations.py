@@ -1,15 +1,71 @@
 """Database operations for the Medical Database Query System"""
 import sqlite3
 import os
-from typing import List, Dict, Any
+import re
+import sys
+from typing import List, Dict, Any, Tuple
+
+from .pool import get_pool
+
+# Introspection results only change on DDL, so keep them until
+# invalidate_schema_cache() is called
+_SCHEMA_CACHE: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+_TABLES_CACHE: Dict[str, List[str]] = {}
+_COLUMNS_CACHE: Dict[Tuple[str, str], List[str]] = {}
+
+# Every SQLite database file starts with this magic string
+_SQLITE_HEADER = b"SQLite format 3\x00"
+
+_IDENT_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+
+def _validate_ident(name: str) -> str:
+    """Return `name` if it is a plain SQL identifier, else raise ValueError.
+
+    PRAGMA arguments can't be bound as parameters, so table names are checked
+    before being spliced into the statement.
+    """
+    if not isinstance(name, str) or not _IDENT_RE.fullmatch(name):
+        raise ValueError(f"Invalid table name: {name!r}")
+    return name
+
+
+def _column_names(cursor: sqlite3.Cursor) -> List[str]:
+    """Return the column names of the cursor's last query.
+
+    Names are interned so the same column name returned by many calls (e.g.
+    the fixed PRAGMA table_info columns) shares one string object.
+    """
+    if not cursor.description:
+        return []
+    return [sys.intern(desc[0]) for desc in cursor.description]
+
+
+def invalidate_schema_cache() -> None:
+    """Forget cached table lists and table info for all databases."""
+    _SCHEMA_CACHE.clear()
+    _TABLES_CACHE.clear()
+    _COLUMNS_CACHE.clear()
+
 
 class DatabaseOperations:
     def __init__(self, db_path: str):
         """Initialize database connection"""
         self.db_path = db_path
         
-    def check_database_exists(self) -> bool:
-        """Check if the database file exists and is a valid SQLite database"""
+    def check_database_exists(self, deep: bool = False) -> bool:
+        """Check if the database file exists and is a valid SQLite database
+
+        Args:
+            deep: If True, open the database and query it instead of only
+                checking the file header (use for start-up validation)
+        """
+        if not deep:
+            try:
+                with open(self.db_path, "rb") as f:
+                    return f.read(16) == _SQLITE_HEADER
+            except OSError:
+                return False
         if not os.path.exists(self.db_path):
             return False
         try:
@@ -21,6 +77,24 @@ class DatabaseOperations:
         except sqlite3.Error:
             return False
 
+    def execute_query_raw(self, query: str, params: Tuple = (), safe: bool = False) -> Tuple[List[str], List[Tuple]]:
+        """Execute SQL query and return (columns, rows) without building dictionaries
+
+        Args:
+            query: The SQL query to execute
+            params: Values bound to the query's placeholders
+            safe: If True, return empty results instead of raising error when table doesn't exist
+        """
+        # Lock contention is handled by SQLite's busy timeout on pooled connections
+        try:
+            with get_pool(self.db_path).connection() as conn:
+                cursor = conn.execute_cached(query, params)
+                return _column_names(cursor), cursor.fetchall()
+        except sqlite3.OperationalError as e:
+            if safe and "no such table" in str(e):
+                return [], []
+            raise e
+
     def execute_query(self, query: str, safe: bool = False) -> List[Dict[str, Any]]:
         """Execute SQL query and return results as list of dictionaries
         
@@ -28,28 +102,41 @@ class DatabaseOperations:
             query: The SQL query to execute
             safe: If True, return empty list instead of raising error when table doesn't exist
         """
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                with sqlite3.connect(self.db_path, timeout=10) as conn:
-                    conn.row_factory = sqlite3.Row
-                    cursor = conn.cursor()
-                    cursor.execute(query)
-                    return [dict(row) for row in cursor.fetchall()]
-            except sqlite3.OperationalError as e:
-                if "database is locked" in str(e) and attempt < max_retries - 1:
-                    import time
-                    time.sleep(1)  # Wait a second before retrying
-                    continue
-                if safe and "no such table" in str(e):
-                    return []
-                raise e
+        # Column names are read once per query, not once per row
+        columns, rows = self.execute_query_raw(query, safe=safe)
+        return [dict(zip(columns, row)) for row in rows]
 
     def get_table_info(self, table_name: str) -> List[Dict[str, Any]]:
-        """Get table schema information"""
-        return self.execute_query(f"PRAGMA table_info({table_name})")
+        """Get table schema information (cached until the schema changes)
+
+        The table name is spliced into the PRAGMA, so every table gets its own
+        prepared statement. Prefer `get_columns_for` when only names are needed.
+        """
+        key = (self.db_path, table_name)
+        info = _SCHEMA_CACHE.get(key)
+        if info is None:
+            query = "PRAGMA table_info(" + _validate_ident(table_name) + ")"
+            info = _SCHEMA_CACHE[key] = self.execute_query(query)
+        return info
 
     def get_tables(self) -> List[str]:
-        """Get list of all tables in the database"""
-        query = "SELECT name FROM sqlite_master WHERE type='table'"
-        return [row['name'] for row in self.execute_query(query)]
\ No newline at end of file
+        """Get list of all tables in the database (cached until the schema changes)"""
+        tables = _TABLES_CACHE.get(self.db_path)
+        if tables is None:
+            query = "SELECT name FROM sqlite_master WHERE type='table'"
+            _, rows = self.execute_query_raw(query)
+            tables = _TABLES_CACHE[self.db_path] = [row[0] for row in rows]
+        return tables
+
+    def get_columns_for(self, table_name: str) -> List[str]:
+        """Get the column names of a table (cached until the schema changes)
+
+        Uses the pragma_table_info table-valued function with a bound parameter,
+        so one prepared statement serves every table.
+        """
+        key = (self.db_path, table_name)
+        names = _COLUMNS_CACHE.get(key)
+        if names is None:
+            _, rows = self.execute_query_raw("SELECT name FROM pragma_table_info(?)", (table_name,))
+            names = _COLUMNS_CACHE[key] = [row[0] for row in rows]
+        return names
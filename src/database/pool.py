@@ -0,0 +1,216 @@
+"""Reusable SQLite connections shared by the query helpers.
+
+Opening a connection per query throws away SQLite's page cache and repeats
+the connection setup on every call. `ConnectionPool` keeps a small set of
+connections per database file and hands them out through `connection()`.
+"""
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, Tuple
+
+# Number of SQL strings kept prepared per connection
+STATEMENT_CACHE_SIZE = 128
+
+# Seconds to wait for a connection when all of them are checked out
+CHECKOUT_TIMEOUT = 30.0
+
+# Applied once to every newly opened connection: WAL so readers don't block
+# behind writers, reads served through mmap, a 32MB page cache and up to 10s
+# of waiting on a locked database before giving up
+_CONNECTION_PRAGMAS = """
+    PRAGMA busy_timeout=10000;
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA mmap_size=268435456;
+    PRAGMA cache_size=-32768;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA foreign_keys=ON;
+"""
+
+# Actions a read-only connection may perform; everything else is denied by
+# SQLite while the statement is being prepared
+_READ_ONLY_ACTIONS = frozenset((
+    sqlite3.SQLITE_SELECT,
+    sqlite3.SQLITE_READ,
+    sqlite3.SQLITE_FUNCTION,
+    sqlite3.SQLITE_RECURSIVE,
+))
+
+
+def _read_only_authorizer(action: int, *_args) -> int:
+    """sqlite3 authorizer callback that only permits reading."""
+    return sqlite3.SQLITE_OK if action in _READ_ONLY_ACTIONS else sqlite3.SQLITE_DENY
+
+
+# Bumped whenever DDL runs so connections drop statements prepared against
+# the old schema
+_schema_generation = 0
+
+
+def invalidate_statement_cache() -> None:
+    """Make every pooled connection drop its cached statements."""
+    global _schema_generation
+    _schema_generation += 1
+
+
+class PooledConnection(sqlite3.Connection):
+    """SQLite connection that keeps one cursor per SQL text for reuse."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stmt_cache: "OrderedDict[str, sqlite3.Cursor]" = OrderedDict()
+        self._stmt_generation = _schema_generation
+
+    def execute_cached(self, sql: str, params: Tuple = ()) -> sqlite3.Cursor:
+        """Execute `sql` on a cursor reused from earlier calls with the same text.
+
+        The returned cursor is shared, so its rows must be consumed before the
+        same SQL is executed again on this connection.
+        """
+        cache = self._stmt_cache
+        if self._stmt_generation != _schema_generation:
+            self.clear_statement_cache()
+        cur = cache.get(sql)
+        if cur is None:
+            cur = self.cursor()
+            cache[sql] = cur
+            if len(cache) > STATEMENT_CACHE_SIZE:
+                cache.popitem(last=False)[1].close()
+        else:
+            cache.move_to_end(sql)
+        cur.execute(sql, params)
+        return cur
+
+    def discard_cached(self, sql: str) -> None:
+        """Close and forget the cursor kept for `sql`, resetting its statement."""
+        cur = self._stmt_cache.pop(sql, None)
+        if cur is not None:
+            cur.close()
+
+    def clear_statement_cache(self) -> None:
+        """Close all cached cursors."""
+        while self._stmt_cache:
+            self._stmt_cache.popitem()[1].close()
+        self._stmt_generation = _schema_generation
+
+
+class ConnectionPool:
+    """A fixed-size pool of SQLite connections to a single database file."""
+
+    def __init__(self, db_path: str, size: int = 8, read_only: bool = False,
+                 timeout: float = CHECKOUT_TIMEOUT):
+        """Initialize the pool. Connections are opened lazily on first use.
+
+        Args:
+            db_path: Path to the SQLite database file
+            size: Maximum number of open connections
+            read_only: If True, connections refuse anything but reads
+            timeout: Seconds to wait for a free connection before giving up
+        """
+        self.db_path = db_path
+        self.size = size
+        self.read_only = read_only
+        self.timeout = timeout
+        self._idle: "queue.Queue[PooledConnection]" = queue.Queue(maxsize=size)
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def _open(self) -> PooledConnection:
+        """Open and configure a new connection."""
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=STATEMENT_CACHE_SIZE,
+            factory=PooledConnection,
+        )
+        conn.executescript(_CONNECTION_PRAGMAS)
+        if self.read_only:
+            conn.set_authorizer(_read_only_authorizer)
+        return conn
+
+    def _get(self) -> PooledConnection:
+        """Take an idle connection, opening a new one while under the size limit.
+
+        Raises sqlite3.OperationalError if none is returned within `timeout`
+        seconds, e.g. because a caller abandoned an unfinished
+        `execute_select_iter` generator that still holds its connection.
+        """
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_open = self._opened < self.size
+            if can_open:
+                self._opened += 1
+        if not can_open:
+            try:
+                return self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                raise sqlite3.OperationalError(
+                    f"no pooled connection to {self.db_path} became free within "
+                    f"{self.timeout:g}s; all {self.size} are checked out"
+                ) from None
+        try:
+            return self._open()
+        except Exception:
+            with self._lock:
+                self._opened -= 1
+            raise
+
+    def _discard(self, conn: PooledConnection) -> None:
+        """Close a connection and free its slot so a fresh one gets opened."""
+        try:
+            conn.close()
+        finally:
+            with self._lock:
+                self._opened -= 1
+
+    @contextmanager
+    def connection(self) -> Iterator[PooledConnection]:
+        """Borrow a connection for the duration of the `with` block.
+
+        The connection is returned to the pool afterwards. If the block raises,
+        the connection is closed instead and replaced on the next request.
+        """
+        conn = self._get()
+        try:
+            yield conn
+        except Exception:
+            self._discard(conn)
+            raise
+        except BaseException:
+            # e.g. GeneratorExit from a consumer that stopped iterating early
+            self._idle.put(conn)
+            raise
+        else:
+            self._idle.put(conn)
+
+    def close(self) -> None:
+        """Close all idle connections."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(conn)
+
+
+_POOLS: Dict[Tuple[str, bool], ConnectionPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_pool(db_path: str, read_only: bool = False) -> ConnectionPool:
+    """Return the shared pool for `db_path`, creating it on first use."""
+    key = (db_path, read_only)
+    pool = _POOLS.get(key)
+    if pool is None:
+        with _POOLS_LOCK:
+            pool = _POOLS.get(key)
+            if pool is None:
+                pool = _POOLS[key] = ConnectionPool(db_path, read_only=read_only)
+    return pool
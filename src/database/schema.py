@@ -1,42 +1,83 @@
 """Schema definition and helper to create the SQLite medical schema.
 
-This module exposes `SCHEMA_SQL` (ordered list of CREATE TABLE statements) and
-`create_schema(conn)` convenience function.
+This module exposes `SCHEMA_SQL` (ordered tuple of CREATE TABLE statements),
+`REGISTRY` (table name -> tuple of column names) and the `create_schema(conn)`
+convenience function.
+
+`SCHEMA_SQL` is precomputed in schema_sql.py so start-up doesn't parse
+schema.json; regenerate it with `python tools/gen_schema.py` after editing the
+JSON. `_build_schema_sql()` remains as the generator and for `--check`.
 """
+import functools
 import json
+import sys
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, Tuple
+
+from .db_operations import invalidate_schema_cache
+from .pool import invalidate_statement_cache
+from .schema_sql import SCHEMA_SQL
+
+# Schema definition shipped in the repository's data/ directory
+SCHEMA_PATH = Path(__file__).resolve().parents[2] / "data" / "schema.json"
+
+
+@functools.lru_cache(maxsize=1)
+def _load_schema_json() -> Dict:
+    """Read and parse schema.json on first use."""
+    with open(SCHEMA_PATH) as f:
+        return json.load(f)
 
-# Load schema from JSON
-SCHEMA_PATH = Path(__file__).parent / "schema.json"
-with open(SCHEMA_PATH) as f:
-    SCHEMA_JSON = json.load(f)
 
-def _build_schema_sql() -> List[str]:
-    """Build CREATE TABLE statements from schema.json."""
+@functools.lru_cache(maxsize=1)
+def _build_registry() -> Dict[str, Tuple[str, ...]]:
+    """Map each table to its column names, read once from schema.json."""
+    return {
+        table: tuple(sys.intern(col["name"]) for col in info["columns"])
+        for table, info in _load_schema_json()["tables"].items()
+    }
+
+
+def columns(table: str) -> Tuple[str, ...]:
+    """Return the column names of `table`.
+
+    Raises KeyError for tables not defined in schema.json.
+    """
+    return _build_registry()[table]
+
+
+@functools.lru_cache(maxsize=1)
+def _build_schema_sql() -> Tuple[str, ...]:
+    """Build CREATE TABLE statements from schema.json (used by tools/gen_schema.py)."""
     sql = []
-    for table, info in SCHEMA_JSON["tables"].items():
+    for table, info in _load_schema_json()["tables"].items():
+        # One pass over the columns collects both column specs and the
+        # foreign key constraints that follow them
         cols = []
+        fks = []
         for col in info["columns"]:
-            spec = [col["name"], col["type"]]
-            if col.get("primary_key"):
-                spec.append("PRIMARY KEY")
-            cols.append(" ".join(spec))
-        
-        # Add foreign key constraints
-        for col in info["columns"]:
-            if "references" in col:
-                ref = col["references"]
-                cols.append(f"FOREIGN KEY({col['name']}) REFERENCES {ref['table']}({ref['column']})")
-        
-        create_stmt = f"CREATE TABLE IF NOT EXISTS {table} (\n    "
-        create_stmt += ",\n    ".join(cols)
-        create_stmt += "\n);"
-        sql.append(create_stmt)
-    return sql
-
-# Generate SQL statements from schema
-SCHEMA_SQL: List[str] = _build_schema_sql()
+            name = col["name"]
+            cols.append(f"{name} {col['type']} PRIMARY KEY" if col.get("primary_key") else f"{name} {col['type']}")
+            ref = col.get("references")
+            if ref:
+                fks.append(f"FOREIGN KEY({name}) REFERENCES {ref['table']}({ref['column']})")
+        sql.append(f"CREATE TABLE IF NOT EXISTS {table} (\n    " + ",\n    ".join(cols + fks) + "\n);")
+    return tuple(sql)
+
+
+def get_schema_sql() -> Tuple[str, ...]:
+    """Return the CREATE TABLE statements for the schema."""
+    return SCHEMA_SQL
+
+
+def __getattr__(name: str):
+    """Resolve `SCHEMA_JSON` and `REGISTRY` lazily on first access."""
+    if name == "REGISTRY":
+        return _build_registry()
+    if name == "SCHEMA_JSON":
+        return _load_schema_json()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 def create_schema(conn) -> None:
     """Create all tables (idempotent).
@@ -45,8 +86,8 @@ def create_schema(conn) -> None:
         conn: sqlite3.Connection
     """
     cur = conn.cursor()
-    # enable foreign keys enforcement
-    cur.execute("PRAGMA foreign_keys = ON;")
-    for stmt in SCHEMA_SQL:
-        cur.executescript(stmt)
-    conn.commit()
+    # enable foreign keys enforcement (a no-op inside a transaction, so it
+    # goes first) and create every table in a single transaction
+    cur.executescript("PRAGMA foreign_keys = ON;\nBEGIN;\n" + "\n".join(SCHEMA_SQL) + "\nCOMMIT;")
+    invalidate_statement_cache()
+    invalidate_schema_cache()
@@ -0,0 +1,12 @@
+"""CREATE TABLE statements for the medical schema.
+
+Generated by tools/gen_schema.py from data/schema.json -- do not edit by hand.
+"""
+
+SCHEMA_SQL = (
+    'CREATE TABLE IF NOT EXISTS patients (\n    patient_id INTEGER PRIMARY KEY,\n    name TEXT,\n    age INTEGER,\n    gender TEXT\n);',
+    'CREATE TABLE IF NOT EXISTS doctors (\n    doctor_id INTEGER PRIMARY KEY,\n    name TEXT,\n    specialty TEXT\n);',
+    'CREATE TABLE IF NOT EXISTS medications (\n    med_id INTEGER PRIMARY KEY,\n    name TEXT,\n    manufacturer TEXT\n);',
+    'CREATE TABLE IF NOT EXISTS appointments (\n    appt_id INTEGER PRIMARY KEY,\n    patient_id INTEGER,\n    doctor_id INTEGER,\n    date TEXT,\n    reason TEXT,\n    FOREIGN KEY(patient_id) REFERENCES patients(patient_id),\n    FOREIGN KEY(doctor_id) REFERENCES doctors(doctor_id)\n);',
+    'CREATE TABLE IF NOT EXISTS prescriptions (\n    presc_id INTEGER PRIMARY KEY,\n    patient_id INTEGER,\n    med_id INTEGER,\n    dosage TEXT,\n    date TEXT,\n    FOREIGN KEY(patient_id) REFERENCES patients(patient_id),\n    FOREIGN KEY(med_id) REFERENCES medications(med_id)\n);',
+)
@@ -2,26 +2,236 @@
 Rule-based natural language to SQL converter for medical database queries.
 Uses explicit rules and patterns for robust query understanding.
 """
+import calendar
+import functools
+import os
 import re
-import spacy
-import sqlparse
+import textwrap
+import time
 import logging
-from datetime import datetime
+from datetime import date, timedelta
 from typing import Dict, List, Optional, Tuple, Any
 
+from ..database import schema as db_schema
+
+try:
+    import re2
+except ImportError:  # google-re2 is optional; re is used without it
+    re2 = None
+
 # Set up logger
 logger = logging.getLogger("QuerySystem.Text2SQL")
 
-# Load spaCy model
-try:
-    logger.info("Loading spaCy model...")
-    nlp = spacy.load("en_core_web_sm")
-    logger.info("spaCy model loaded successfully")
-except:
-    logger.warning("spaCy model not found, downloading...")
-    spacy.cli.download("en_core_web_sm")
-    nlp = spacy.load("en_core_web_sm")
-    logger.info("spaCy model downloaded and loaded successfully")
+# Number of converted questions remembered per model instance
+CONVERT_CACHE_SIZE = 2048
+
+# Keyword combinations whose dispatching regex is kept per model instance
+DISPATCH_CACHE_SIZE = 256
+
+# Questions handed to spaCy per nlp.pipe batch by convert_batch
+SPACY_BATCH_SIZE = int(os.environ.get("T2S_SPACY_BATCH", "64"))
+
+# Questions whose spaCy person names are remembered across calls and instances
+PARSE_CACHE_SIZE = 512
+
+# Pipeline components the entity extraction never reads; only ner is needed
+_SPACY_DISABLED = ["tagger", "parser", "lemmatizer", "attribute_ruler"]
+
+
+@functools.lru_cache(maxsize=1)
+def _get_nlp():
+    """Load the spaCy model on first use, without the unused components."""
+    import spacy
+
+    try:
+        logger.info("Loading spaCy model...")
+        nlp = spacy.load("en_core_web_sm", disable=_SPACY_DISABLED)
+        logger.info("spaCy model loaded successfully")
+    except OSError:
+        logger.warning("spaCy model not found, downloading...")
+        spacy.cli.download("en_core_web_sm")
+        nlp = spacy.load("en_core_web_sm", disable=_SPACY_DISABLED)
+        logger.info("spaCy model downloaded and loaded successfully")
+    return nlp
+
+
+def _persons_in(doc) -> Tuple[Tuple[str, bool], ...]:
+    """Return (name, is_doctor) for each PERSON entity in a spaCy doc.
+
+    Walks the tokens' IOB tags once instead of building `doc.ents` spans.
+    A name counts as a doctor's when the token before it is a title.
+    """
+    persons = []
+    previous = ""
+    for token in doc:
+        if token.ent_type_ == "PERSON":
+            if token.ent_iob_ == "B":
+                start = token.idx
+                persons.append([token.text, previous in ("dr", "dr.", "doctor")])
+            else:
+                persons[-1][0] = doc.text[start:token.idx + len(token.text)]
+        previous = token.lower_
+    return tuple(map(tuple, persons))
+
+
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse(text: str) -> Tuple[Tuple[str, bool], ...]:
+    """Run spaCy on a question and keep only the person names it found.
+
+    Module level so the cache is shared by every model instance, and only
+    the small tuple is kept rather than the whole Doc.
+    """
+    return _persons_in(_get_nlp()(text))
+
+
+def _months_before(day: date, months: int) -> date:
+    """Return the date `months` calendar months before `day`.
+
+    The day of month is clamped to the length of the target month, so one
+    month before March 31st is the last day of February.
+    """
+    year, month = divmod(day.year * 12 + day.month - 1 - months, 12)
+    month += 1
+    return day.replace(year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1]))
+
+
+_REGEX_META = frozenset(".^$*+?{}[]|()")
+
+
+def _literal_texts(pattern: str) -> Optional[Tuple[str, ...]]:
+    """Return the texts matched by a `^literal$` pattern, or None if it isn't one.
+
+    Single characters made optional with `?`, as in `patients?`, are expanded
+    into both spellings.
+    """
+    if not (pattern.startswith("^") and pattern.endswith("$")):
+        return None
+    texts = [""]
+    body = pattern[1:-1]
+    i = 0
+    while i < len(body):
+        ch = body[i]
+        if ch == "\\":
+            i += 1
+            ch = body[i:i + 1]
+            # \d, \s, \b and friends are classes, not escaped literals
+            if not ch or ch.isalnum():
+                return None
+        elif ch in _REGEX_META:
+            return None
+        i += 1
+        if body[i:i + 1] == "?":
+            i += 1
+            texts += [text + ch for text in texts]
+        else:
+            texts = [text + ch for text in texts]
+    return tuple(texts)
+
+
+# Blood types as written in the patients table
+_VALID_BLOOD = frozenset(("A+", "A-", "B+", "B-", "AB+", "AB-", "O+", "O-"))
+
+
+_PLACEHOLDER_RE = re.compile(r"\{(\w+)\}")
+
+
+def _bind_params(sql: str) -> Tuple[str, Tuple[str, ...]]:
+    """Replace {name} placeholders with ? for SQLite parameter binding.
+
+    Returns:
+        The SQL and the placeholder names in the order their values are bound
+    """
+    names = []
+
+    def bind(match):
+        names.append(match.group(1))
+        return "?"
+
+    return _PLACEHOLDER_RE.sub(bind, sql), tuple(names)
+
+
+def _tidy_sql(sql: str) -> str:
+    """Dedent SQL written inline in the code and drop blank edges and trailing spaces."""
+    return "\n".join(line.rstrip() for line in textwrap.dedent(sql).strip().splitlines())
+
+
+# Base queries of the entity fallback builders, which add their filters as
+# ? parameters
+APPT_BASE_SQL = _tidy_sql("""
+    SELECT a.date, p.name as patient_name, d.name as doctor_name, a.reason
+    FROM appointments a
+    JOIN patients p ON a.patient_id = p.patient_id
+    JOIN doctors d ON a.doctor_id = d.doctor_id""")
+PATIENT_BASE_SQL = "SELECT name, age, gender FROM patients"
+MEDICATION_BASE_SQL = _tidy_sql("""
+    SELECT m.name as medication, p.dosage, p.date, pt.name as patient_name
+    FROM prescriptions p
+    JOIN medications m ON p.med_id = m.med_id
+    JOIN patients pt ON p.patient_id = pt.patient_id""")
+
+
+def _strip_anchors(pattern: str) -> Tuple[str, bool]:
+    """Drop the `^` and `$` sentinels from an anchored pattern.
+
+    Returns:
+        The pattern without them and whether it was anchored at both ends
+    """
+    body = pattern[1:] if pattern.startswith("^") else pattern
+    full = body.endswith("$") and not body.endswith("\\$")
+    return (body[:-1] if full else body), full
+
+
+def _compile_linear(pattern: str):
+    """Compile a fixed pattern with RE2 when it is installed, else with re.
+
+    RE2 matches in time linear in the text, so unusual questions can't make
+    these patterns backtrack. A pattern RE2 can't express stays on re.
+    """
+    if re2 is not None:
+        try:
+            return re2.compile(pattern)
+        except re2.error:
+            pass
+    return re.compile(pattern)
+
+
+@functools.lru_cache(maxsize=None)
+def _compile(pattern: str) -> re.Pattern:
+    """Compile a single lowercase rule pattern, once per process."""
+    return re.compile(pattern)
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_rules(rules: Tuple[Tuple[str, str], ...]) -> Tuple[re.Pattern, Dict[str, Tuple[int, int]]]:
+    """Compile (name, pattern) rules into one dispatching regex.
+
+    The rules become one alternation of named groups, in priority order, so a
+    single match() finds the first rule that matches anywhere in the text and
+    `match.lastgroup` names it. Rules anchored with `^` are only tried at the
+    start instead of at every position, and `^...$` rules must match the
+    whole text, like fullmatch(). Patterns are written in lowercase and
+    matched against lowercased text, without re.IGNORECASE. Cached so every
+    model instance, and every keyword-filtered subset of the rules, is only
+    compiled once.
+
+    Returns:
+        The combined pattern and, per rule, the slice of `match.groups()`
+        holding that rule's own capture groups
+    """
+    alternatives = []
+    for name, pattern in rules:
+        if pattern.startswith("^"):
+            body, full = _strip_anchors(pattern)
+            end = r"\Z" if full else ""
+            alternatives.append(f"(?P<{name}>(?:{body}){end})")
+        else:
+            alternatives.append(f"(?P<{name}>(?s:.*?)(?:{pattern}))")
+    combined = re.compile("|".join(alternatives))
+    rule_groups = {}
+    for name, pattern in rules:
+        start = combined.groupindex[name]
+        rule_groups[name] = (start, start + _compile(pattern).groups)
+    return combined, rule_groups
 
 
 class QueryRule:
@@ -34,13 +244,13 @@ class QueryRule:
         
         Args:
             name: Rule identifier
-            patterns: List of regex patterns to match
+            patterns: List of lowercase regex patterns, matched against lowercased text
             sql_template: SQL query template with {param} placeholders
             extract_params: Function to extract parameters from match
             validate_params: Function to validate extracted parameters
         """
         self.name = name
-        self.patterns = [re.compile(p, re.IGNORECASE) for p in patterns]
+        self.patterns = [_compile(p) for p in patterns]
         self.sql_template = sql_template
         self.extract_params = extract_params or (lambda x: x.groups())
         self.validate_params = validate_params or (lambda x: True)
@@ -48,9 +258,66 @@ class QueryRule:
 
 class Text2SQLModel:
     """Convert natural language medical queries to SQL using NLP and pattern matching."""
+
+    # Entity patterns for the regex extractor; names are capitalized word runs,
+    # optionally introduced by a doctor title
+    _PERSON_RE = _compile_linear(r"\b(?:((?i:dr\b\.?|doctor))\s+)?([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)")
+    _DATE_RE = _compile_linear(r"\b2\d{3}(?:-\d{2}){0,2}\b")
+    _AGE_RE = _compile_linear(r"(\d+)\s*(?:year(?:s)?(?:\s+old)?|yo)")
+    _WORD_RE = _compile_linear(r"[a-z]+")
+    _GENDER_RE = _compile_linear(r"\b(?:(females?|wom[ae]n)|(males?|m[ae]n))\b")
+    _TIME_RE = _compile_linear(r"(?:in |from |during |the |last |past |recent )?(\d+|a|the|this)?\s*(day|week|month)s?")
+    _TIME_UNITS = ("day", "week", "month")
+
+    # Tables the entity fallback builds queries for
+    _ENTITY_TABLES = frozenset(("appointment", "patient", "medication", "prescription"))
+
+    # Query types and their trigger phrases, tried in order; SELECT otherwise
+    _QUERY_TYPE_PHRASES = (
+        ("COUNT", ("how many", "count", "number of")),
+        ("SELECT", ("show me", "list", "what are", "display")),
+        ("AGGREGATE", ("average", "mean")),
+    )
+
+    # Exact questions and the rule answering each, looked up before any regex
+    _LITERAL_RULES = {
+        "how many patients do we have?": "count_patients",
+        "how many doctors are there?": "count_doctors",
+        "how many appointments are there?": "count_appointments",
+        "how many doctors are there in each specialty?": "count_doctors_by_specialty",
+        "count total number of appointments": "count_appointments",
+        "count total number of patients": "count_patients",
+        "show all patients": "all_patients",
+        "list all doctors and their specialties": "all_doctors",
+        "show doctors who have the most appointments": "doctors_most_appointments"
+    }
+
+    # Every blood type phrasing in one pattern, matched against the
+    # lowercased question. The word in front of the type picks the template
+    _BLOOD_RE = _compile_linear(
+        r"\b(?:(?P<by_group>blood\s+group)|(?P<by_of>of)|(?:blood\s+)?type|with|having)"
+        r"\s+(?P<blood_type>(?:ab|[abo])[+-])"
+    )
     
-    def __init__(self):
-        """Initialize the converter with query patterns and NLP components."""
+    def __init__(self, use_spacy: bool = False):
+        """Initialize the converter with query patterns and NLP components.
+
+        Args:
+            use_spacy: If True, find person names with spaCy NER instead of
+                the capitalization regex
+        """
+        self.use_spacy = use_spacy
+        # Date filters computed so far today, keyed by (unit, number)
+        self._today = None
+        self._date_cache = {}
+        # Per-instance cache of converted questions
+        self._convert_cached = functools.lru_cache(maxsize=CONVERT_CACHE_SIZE)(self._convert)
+        # Rule answers keyed by the lowercased question, so questions that
+        # only differ in case share them
+        self._rules_cached = functools.lru_cache(maxsize=CONVERT_CACHE_SIZE)(self._match_rules_on)
+        # spaCy docs parsed ahead by convert_batch, keyed by question
+        self._docs = {}
+
         # Query type patterns with improved matching
         self.query_types = {
             "count": r"(?:how many|count|number of|total number of)",
@@ -66,15 +333,24 @@ class Text2SQLModel:
             "patient": ["patient", "patients", "person", "people"],
             "doctor": ["doctor", "doctors", "physician", "physicians", "specialist", "specialists", "dr", "dr."],
             "appointment": ["appointment", "appointments", "visit", "visits", "consultation", "consultations"],
-            "specialty": ["specialty", "specialties", "specialization", "specializations"]
+            "specialty": ["specialty", "specialties", "specialization", "specializations"],
+            "medication": ["medication", "medications", "medicine", "medicines", "drug", "drugs"],
+            "prescription": ["prescription", "prescriptions", "prescribed"]
         }
+        # Every variation mapped back to its table name, for per-word lookups
+        self._term_lookup = {syn: canon for canon, syns in self.term_map.items() for syn in syns}
+        self._term_set = frozenset(self._term_lookup)
+        # Tables found in the last question, which the routing checks and
+        # the query builders all ask about in turn
+        self._last_terms = (None, frozenset())
 
-        # Entity patterns
+        # Entity patterns. The gaps between keywords are bounded so a miss
+        # can't backtrack through the whole text once per gap
         self.patterns = {
             # Enhanced analytics queries
             "doctors_most_appointments": {
-                "pattern": r"(?:show|list|get|find|who are).*(?:the\s+)?doctors?.*(?:most|busiest|highest number of|with the most).*appointments?",
-                "sql": lambda _: """
+                "pattern": r"(?:show|list|get|find|who are)[^\n]{0,80}doctors?[^\n]{0,80}(?:most|busiest|highest number of|with the most)[^\n]{0,80}appointments?",
+                "sql": ("""
                     WITH DoctorStats AS (
                         SELECT 
                             d.doctor_id,
@@ -101,11 +377,11 @@ class Text2SQLModel:
                         percentage || '%' as workload_percentage
                     FROM DoctorStats
                     ORDER BY appointment_count DESC
-                    LIMIT 5"""
+                    LIMIT 5""", ())
             },
             "doctors_with_min_appointments": {
-                "pattern": r"(?:show|list|get|find)?.*doctors?.*(?:with|having|" + self.query_types["threshold"] + ").*appointments?",
-                "sql": lambda threshold: f"""
+                "pattern": r"(?=[^\n]{0,80}more than (\d+))[^\n]{0,80}doctors?[^\n]{0,80}(?:with|having|" + self.query_types["threshold"] + r")[^\n]{0,80}appointments?",
+                "sql": ("""
                     SELECT 
                         d.name, 
                         d.specialty, 
@@ -115,92 +391,121 @@ class Text2SQLModel:
                     LEFT JOIN appointments a ON d.doctor_id = a.doctor_id
                     GROUP BY d.doctor_id, d.name, d.specialty
                     HAVING COUNT(a.appointment_id) > {threshold}
-                    ORDER BY appointment_count DESC"""
+                    ORDER BY appointment_count DESC""", ("threshold",))
             },
             # Patient queries matching example patterns exactly
             "all_patients": {
                 "pattern": r"^show all patients?$",
-                "sql": lambda _: """
+                "sql": ("""
+                    WITH PatientVisits AS (
+                        SELECT patient_id, COUNT(*) as appointment_count, MAX(date) as last_visit
+                        FROM appointments
+                        GROUP BY patient_id
+                    )
                     SELECT 
                         name,
                         age,
                         gender,
                         blood_type,
-                        (SELECT COUNT(*) FROM appointments a WHERE a.patient_id = p.patient_id) as appointment_count,
-                        (SELECT MAX(date) FROM appointments a WHERE a.patient_id = p.patient_id) as last_visit
+                        COALESCE(v.appointment_count, 0) as appointment_count,
+                        v.last_visit
                     FROM patients p
-                    ORDER BY name"""
+                    LEFT JOIN PatientVisits v ON v.patient_id = p.patient_id
+                    ORDER BY name""", ())
             },
             "patients_by_age": {
                 "pattern": r"^show all patients? older than (\d+)$",
-                "sql": lambda age: f"""
+                "sql": ("""
+                    WITH PatientVisits AS (
+                        SELECT patient_id, COUNT(*) as appointment_count
+                        FROM appointments
+                        GROUP BY patient_id
+                    )
                     SELECT 
                         name,
                         age,
                         gender,
                         blood_type,
-                        (SELECT COUNT(*) FROM appointments a WHERE a.patient_id = p.patient_id) as appointment_count
+                        COALESCE(v.appointment_count, 0) as appointment_count
                     FROM patients p
-                    WHERE age > {int(age)}
-                    ORDER BY age DESC, name"""
+                    LEFT JOIN PatientVisits v ON v.patient_id = p.patient_id
+                    WHERE age > {age}
+                    ORDER BY age DESC, name""", ("age",))
             },
+            # Blood type queries, dispatched by _match_blood_type_query
             "patients_by_blood": {
-                "pattern": r"^(?:list|show) patients? with blood type ([ABO][+-])$",
-                "sql": lambda blood_type: f"""
+                "sql": ("""
+                    WITH PatientVisits AS (
+                        SELECT patient_id, COUNT(*) as appointment_count, MAX(date) as last_visit
+                        FROM appointments
+                        GROUP BY patient_id
+                    )
                     SELECT 
                         name,
                         age,
                         gender,
                         blood_type,
-                        (SELECT COUNT(*) FROM appointments a WHERE a.patient_id = p.patient_id) as appointment_count,
-                        (SELECT MAX(date) FROM appointments a WHERE a.patient_id = p.patient_id) as last_visit
+                        COALESCE(v.appointment_count, 0) as appointment_count,
+                        v.last_visit
                     FROM patients p
-                    WHERE blood_type = '{blood_type.upper()}'
-                    ORDER BY name"""
+                    LEFT JOIN PatientVisits v ON v.patient_id = p.patient_id
+                    WHERE blood_type = {blood_type}
+                    ORDER BY name""", ("blood_type",))
             },
             "patient_age": {
-                "pattern": r"(?:show|list|get)?\s*(?:all\s+)?(?:patients?|people).*(?:over|older than)\s+(\d+)(?:\s+years)?.*(?:old)?",
-                "sql": lambda age: f"""
+                "pattern": r"(?:patients?|people)[^\n]{0,80}(?:over|older than)\s+(\d+)",
+                "sql": ("""
+                    WITH PatientVisits AS (
+                        SELECT patient_id, COUNT(*) as appointment_count
+                        FROM appointments
+                        GROUP BY patient_id
+                    )
                     SELECT 
                         name,
                         age,
                         gender,
                         blood_type,
-                        (SELECT COUNT(*) FROM appointments a WHERE a.patient_id = p.patient_id) as appointment_count
-                    FROM patients p 
-                    WHERE age > {int(age)}
-                    ORDER BY age DESC, name"""
+                        COALESCE(v.appointment_count, 0) as appointment_count
+                    FROM patients p
+                    LEFT JOIN PatientVisits v ON v.patient_id = p.patient_id
+                    WHERE age > {age}
+                    ORDER BY age DESC, name""", ("age",))
             },
             "patient_blood_type": {
-                "pattern": r"(?:list|show|get|find)?\s*(?:all\s+)?(?:patients?|people).*(?:with|having|of|type|blood type)\s+([ABO][+-])",
-                "sql": lambda blood_type: f"""
+                "sql": ("""
+                    WITH PatientVisits AS (
+                        SELECT patient_id, COUNT(*) as appointment_count, MAX(date) as last_visit
+                        FROM appointments
+                        GROUP BY patient_id
+                    )
                     SELECT 
                         name,
                         age,
                         gender,
                         blood_type,
-                        (SELECT COUNT(*) FROM appointments a WHERE a.patient_id = p.patient_id) as appointment_count,
-                        (SELECT MAX(date) FROM appointments a WHERE a.patient_id = p.patient_id) as last_visit
+                        COALESCE(v.appointment_count, 0) as appointment_count,
+                        v.last_visit
                     FROM patients p
-                    WHERE blood_type = '{blood_type.upper()}'
+                    LEFT JOIN PatientVisits v ON v.patient_id = p.patient_id
+                    WHERE blood_type = {blood_type}
                     ORDER BY 
-                        CASE WHEN (SELECT COUNT(*) FROM appointments a WHERE a.patient_id = p.patient_id) > 0 THEN 0 ELSE 1 END,
-                        (SELECT COUNT(*) FROM appointments a WHERE a.patient_id = p.patient_id) DESC,
-                        name"""
+                        CASE WHEN v.appointment_count > 0 THEN 0 ELSE 1 END,
+                        v.appointment_count DESC,
+                        name""", ("blood_type",))
             },
             "count_patients": {
-                "pattern": r"(?:how many|count|number of|total).*(?:patients?|people)(?:\s+do\s+we\s+have)?",
-                "sql": lambda _: """
+                "pattern": r"(?:how many|count|number of|total)[^\n]{0,80}(?:patients?|people)(?:\s+do\s+we\s+have)?",
+                "sql": ("""
                     SELECT COUNT(*) as total_patients,
                            SUM(CASE WHEN gender = 'M' THEN 1 ELSE 0 END) as male_patients,
                            SUM(CASE WHEN gender = 'F' THEN 1 ELSE 0 END) as female_patients
-                    FROM patients"""
+                    FROM patients""", ())
             },
             
             # Doctor queries matching example patterns
             "all_doctors": {
                 "pattern": r"^list all doctors? and their specialties$",
-                "sql": lambda _: """
+                "sql": ("""
                     SELECT 
                         d.name,
                         d.specialty,
@@ -210,11 +515,11 @@ class Text2SQLModel:
                     LEFT JOIN appointments a ON d.doctor_id = a.doctor_id
                     LEFT JOIN patients p ON a.patient_id = p.patient_id
                     GROUP BY d.doctor_id, d.name, d.specialty
-                    ORDER BY d.specialty, d.name"""
+                    ORDER BY d.specialty, d.name""", ())
             },
             "doctors_by_appointments": {
                 "pattern": r"^show doctors?(?: who have)? (?:with |having )?(?:the )?(?:most|more than \d+) appointments?$",
-                "sql": lambda threshold=None: f"""
+                "sql": ("""
                     WITH DoctorStats AS (
                         SELECT 
                             d.doctor_id,
@@ -227,7 +532,6 @@ class Text2SQLModel:
                         LEFT JOIN appointments a ON d.doctor_id = a.doctor_id
                         LEFT JOIN patients p ON a.patient_id = p.patient_id
                         GROUP BY d.doctor_id, d.name, d.specialty
-                        {'HAVING appointment_count > ' + str(threshold) if threshold else ''}
                     )
                     SELECT 
                         name,
@@ -237,25 +541,27 @@ class Text2SQLModel:
                         ROUND(appointment_count * 1.0 / NULLIF(active_days, 0), 2) as avg_daily_appointments
                     FROM DoctorStats
                     ORDER BY appointment_count DESC
-                    {'' if threshold else 'LIMIT 5'}"""
+                    LIMIT 5""", ())
             },
             "count_doctors": {
                 "pattern": r"(?:how many|count|number of)\s+doctors?\s+(?:are\s+there|do\s+we\s+have|in\s+total)?(?!\s+(?:in\s+each|by|per)\s+specialty)",
-                "sql": lambda _: """
+                "sql": ("""
+                    WITH DoctorVisits AS (
+                        SELECT doctor_id, COUNT(*) as appointment_count
+                        FROM appointments
+                        GROUP BY doctor_id
+                    )
                     SELECT 
                         COUNT(*) as total_doctors,
                         COUNT(DISTINCT specialty) as unique_specialties,
-                        SUM(
-                            (SELECT COUNT(*) FROM appointments a WHERE a.doctor_id = d.doctor_id)
-                        ) as total_appointments,
-                        ROUND(AVG(
-                            (SELECT COUNT(*) FROM appointments a WHERE a.doctor_id = d.doctor_id)
-                        ), 2) as avg_appointments_per_doctor
-                    FROM doctors d"""
+                        SUM(COALESCE(v.appointment_count, 0)) as total_appointments,
+                        ROUND(AVG(COALESCE(v.appointment_count, 0)), 2) as avg_appointments_per_doctor
+                    FROM doctors d
+                    LEFT JOIN DoctorVisits v ON v.doctor_id = d.doctor_id""", ())
             },
             "count_doctors_by_specialty": {
                 "pattern": r"(?:how many|count|number of)\s+doctors?\s+(?:are\s+there\s+)?(?:in\s+each|by|per|across|for\s+each)\s+specialty",
-                "sql": lambda _: """
+                "sql": ("""
                     WITH SpecialtyStats AS (
                         SELECT 
                             d.specialty,
@@ -276,31 +582,31 @@ class Text2SQLModel:
                         ROUND(total_patients * 1.0 / NULLIF(doctor_count, 0), 2) as avg_patients_per_doctor,
                         ROUND(total_appointments * 100.0 / NULLIF((SELECT COUNT(*) FROM appointments), 0), 2) || '%' as workload_percentage
                     FROM SpecialtyStats
-                    ORDER BY doctor_count DESC"""
+                    ORDER BY doctor_count DESC""", ())
             },
             
             # Time-based appointment queries with improved patterns
             "recent_appointments": {
                 "pattern": r"(?:show|list|display|get|what are|find)?\s*appointments?\s*(?:in|from|for|during|within|over)?\s*(?:the\s+)?(?:last|past|recent|previous)?\s*(\d+|a|the|this)?\s*(day|days|week|weeks|month|months|year|years?)(?:\s+ago)?",
-                "sql": lambda number, unit: f"""
+                "sql": ("""
                     WITH date_ranges AS (
                         SELECT 
                             date(MAX(date)) as last_date,
                             CASE 
-                                WHEN '{unit.lower().rstrip('s')}' = 'month' THEN
+                                WHEN {unit} = 'month' THEN
                                     date(MAX(date), 'start of month')
-                                WHEN '{unit.lower().rstrip('s')}' = 'week' THEN
+                                WHEN {unit} = 'week' THEN
                                     date(MAX(date), 'weekday 0', '-0 days')
                                 ELSE
                                     date(MAX(date), '+1 day')
                             END as period_end,
                             CASE 
-                                WHEN '{unit.lower().rstrip('s')}' = 'month' THEN
+                                WHEN {unit} = 'month' THEN
                                     date(MAX(date), 'start of month', '-1 month')
-                                WHEN '{unit.lower().rstrip('s')}' = 'week' THEN
+                                WHEN {unit} = 'week' THEN
                                     date(MAX(date), 'weekday 0', '-7 days')
                                 ELSE
-                                    date(MAX(date), '-{number} days')
+                                    date(MAX(date), '-' || {number} || ' days')
                             END as period_start
                         FROM appointments
                     ),
@@ -335,11 +641,11 @@ class Text2SQLModel:
                     CROSS JOIN date_ranges dr
                     WHERE date(a.date) >= dr.period_start
                     AND date(a.date) < dr.period_end
-                    ORDER BY a.date DESC"""
+                    ORDER BY a.date DESC""", ("number", "unit"))
             },
             "count_recent_appointments": {
                 "pattern": r"(?:how many|count|number of)\s+appointments?\s*(?:in|from|for|during|within|over)\s*(?:the\s+)?(?:last|past|previous)\s*(\d+|a|the|this)?\s*(day|days|week|weeks|month|months|year|years?)(?:\s+ago)?",
-                "sql": lambda number, unit: f"""
+                "sql": ("""
                     WITH TimeBasedStats AS (
                         SELECT 
                             COUNT(*) as total_appointments,
@@ -349,7 +655,7 @@ class Text2SQLModel:
                             MIN(date) as period_start,
                             MAX(date) as period_end
                         FROM appointments
-                        WHERE date(date) >= {self._get_date_filter(number, unit)}
+                        WHERE date(date) >= {date_filter}
                     )
                     SELECT 
                         total_appointments,
@@ -359,11 +665,11 @@ class Text2SQLModel:
                         ROUND(total_appointments * 1.0 / NULLIF(unique_days, 0), 2) as avg_appointments_per_day,
                         period_start as from_date,
                         period_end as to_date
-                    FROM TimeBasedStats"""
+                    FROM TimeBasedStats""", ("date_filter",))
             },
             "doctor_appointments": {
-                "pattern": r"(?:show|list|get|what are)?.*appointments?.*(?:for |with |by |of )?(?:doctor|dr\.?)\s+([A-Za-z\s]+)",
-                "sql": lambda name: f"""
+                "pattern": r"appointments?[^\n]{0,80}(?:doctor|dr\.?)\s+([a-z\s]+)",
+                "sql": ("""
                     SELECT 
                         a.date,
                         p.name as patient,
@@ -380,12 +686,12 @@ class Text2SQLModel:
                     FROM appointments a
                     JOIN doctors d ON a.doctor_id = d.doctor_id
                     JOIN patients p ON a.patient_id = p.patient_id
-                    WHERE d.name LIKE '%{name.strip()}%'
-                    ORDER BY a.date DESC"""
+                    WHERE d.name LIKE '%' || {name} || '%'
+                    ORDER BY a.date DESC""", ("name",))
             },
             "patient_appointments": {
-                "pattern": r"(?:show|list|get|what are)?.*appointments?.*(patient|of|for)\s+([A-Za-z\s]+)",
-                "sql": lambda name: f"""
+                "pattern": r"appointments?[^\n]{0,80}(patient|of|for)\s+([a-z\s]+)",
+                "sql": ("""
                     SELECT 
                         a.date,
                         d.name as doctor,
@@ -406,28 +712,26 @@ class Text2SQLModel:
                     FROM appointments a
                     JOIN doctors d ON a.doctor_id = d.doctor_id
                     JOIN patients p ON a.patient_id = p.patient_id
-                    WHERE p.name LIKE '%{name.strip()}%'
-                    ORDER BY a.date DESC"""
+                    WHERE p.name LIKE '%' || {name} || '%'
+                    ORDER BY a.date DESC""", ("name",))
             },
             
-            # Blood type queries
             "blood_type": {
-                "pattern": r"blood.*(?:type|group)\s+([ABO]+[+-])",
-                "sql": lambda blood_type: f"""
+                "sql": ("""
                     SELECT name, age, blood_type
                     FROM patients
-                    WHERE blood_type = '{blood_type.upper()}'
-                    ORDER BY name"""
+                    WHERE blood_type = {blood_type}
+                    ORDER BY name""", ("blood_type",))
             },
             
             # Count queries
             "count_by_specialty": {
-                "pattern": r"(?:how many|count).*doctors?.*(?:in each|by|per) specialty",
-                "sql": lambda _: """
+                "pattern": r"(?:how many|count)[^\n]{0,80}doctors?[^\n]{0,80}(?:in each|by|per) specialty",
+                "sql": ("""
                     SELECT specialty, COUNT(*) as count
                     FROM doctors
                     GROUP BY specialty
-                    ORDER BY count DESC"""
+                    ORDER BY count DESC""", ())
             }
         }
         
@@ -435,63 +739,138 @@ class Text2SQLModel:
         count_queries = {
             "patients": {
                 "pattern": r"^how many patients do we have\?$",
-                "sql": lambda _: """
+                "sql": ("""
                     SELECT 
                         COUNT(*) as total_patients,
                         SUM(CASE WHEN gender = 'M' THEN 1 ELSE 0 END) as male_patients,
                         SUM(CASE WHEN gender = 'F' THEN 1 ELSE 0 END) as female_patients,
                         COUNT(DISTINCT blood_type) as blood_type_count,
                         ROUND(AVG(age), 1) as avg_age
-                    FROM patients"""
+                    FROM patients""", ())
             },
             "doctors": {
                 "pattern": r"^how many doctors are there\?$",
-                "sql": lambda _: """
+                "sql": ("""
+                    WITH DoctorVisits AS (
+                        SELECT doctor_id, COUNT(*) as appointment_count
+                        FROM appointments
+                        GROUP BY doctor_id
+                    )
                     SELECT 
                         COUNT(*) as total_doctors,
                         COUNT(DISTINCT specialty) as unique_specialties,
-                        ROUND(AVG((
-                            SELECT COUNT(*) 
-                            FROM appointments a 
-                            WHERE a.doctor_id = d.doctor_id
-                        )), 2) as avg_appointments_per_doctor
-                    FROM doctors d"""
+                        ROUND(AVG(COALESCE(v.appointment_count, 0)), 2) as avg_appointments_per_doctor
+                    FROM doctors d
+                    LEFT JOIN DoctorVisits v ON v.doctor_id = d.doctor_id""", ())
             },
             "appointments": {
                 "pattern": r"^(?:how many appointments are there\?|count total number of appointments)$",
-                "sql": lambda _: """
+                "sql": ("""
                     SELECT 
                         COUNT(*) as total_appointments,
                         COUNT(DISTINCT patient_id) as unique_patients,
                         COUNT(DISTINCT doctor_id) as unique_doctors,
                         COUNT(DISTINCT DATE(date)) as unique_days
-                    FROM appointments"""
+                    FROM appointments""", ())
             },
             "specialty_count": {
                 "pattern": r"^how many doctors are there in each specialty\?$",
-                "sql": lambda _: """
+                "sql": ("""
                     SELECT 
-                        specialty,
-                        COUNT(*) as doctor_count,
-                        COUNT(DISTINCT (
-                            SELECT a.patient_id 
-                            FROM appointments a 
-                            WHERE a.doctor_id = d.doctor_id
-                        )) as total_patients,
-                        SUM((
-                            SELECT COUNT(*) 
-                            FROM appointments a 
-                            WHERE a.doctor_id = d.doctor_id
-                        )) as total_appointments
+                        d.specialty,
+                        COUNT(DISTINCT d.doctor_id) as doctor_count,
+                        COUNT(DISTINCT a.patient_id) as total_patients,
+                        COUNT(a.appointment_id) as total_appointments
                     FROM doctors d
-                    GROUP BY specialty
-                    ORDER BY doctor_count DESC"""
+                    LEFT JOIN appointments a ON a.doctor_id = d.doctor_id
+                    GROUP BY d.specialty
+                    ORDER BY doctor_count DESC""", ())
             }
         }
         
         self.patterns.update({f"count_{entity}": pattern_info 
                             for entity, pattern_info in count_queries.items()})
 
+        # Each rule's SQL tidied once, with ? in place of its placeholders and
+        # the order to bind their values in
+        self._sql_cache = {name: _bind_params(_tidy_sql(info["sql"][0])) for name, info in self.patterns.items()}
+
+        # Map a rule's captured groups to the values of its SQL parameters;
+        # rules not listed get their groups as-is
+        self._rule_args = {
+            "doctors_with_min_appointments": lambda threshold, _: (int(threshold),),
+            "patients_by_age": lambda age: (int(age),),
+            "patient_age": lambda age: (int(age),),
+            "recent_appointments": lambda number, unit: (number or "1", unit.lower().rstrip("s")),
+            "count_recent_appointments": lambda number, unit: (self._get_date_filter(number, unit),),
+            "doctor_appointments": lambda name: (name.strip(),),
+            "patient_appointments": lambda _, name: (name.strip(),),
+        }
+
+        self._rule_patterns = tuple(
+            (name, info["pattern"]) for name, info in self.patterns.items() if "pattern" in info
+        )
+        self._combined, self._rule_groups = _compile_rules(self._rule_patterns)
+
+        # Literals a rule's pattern cannot match without: every group needs at
+        # least one of its strings in the text. Rules failing this are left out
+        # of the regex; rules not listed are always tried
+        self._required_kw = {
+            "doctors_most_appointments": (("doctor",), ("appointment",), ("most", "busiest", "highest number of")),
+            "doctors_with_min_appointments": (("more than",), ("doctor",), ("appointment",)),
+            "all_patients": (("show all patient",),),
+            "patients_by_age": (("show all patient",), ("older than",)),
+            "patient_age": (("patient", "people"), ("over", "older than")),
+            "count_patients": (("how many patients do we have?",),),
+            "all_doctors": (("list all doctor",), ("and their specialties",)),
+            "doctors_by_appointments": (("show doctor",), ("most", "more than"), ("appointment",)),
+            "count_doctors": (("how many doctors are there?",),),
+            "count_doctors_by_specialty": (("how many", "count", "number of"), ("doctor",), ("specialty",)),
+            "recent_appointments": (("appointment",), ("day", "week", "month", "year")),
+            "count_recent_appointments": (("how many", "count", "number of"), ("appointment",),
+                                          ("last", "past", "previous"), ("day", "week", "month", "year")),
+            "doctor_appointments": (("appointment",), ("doctor", "dr")),
+            "patient_appointments": (("appointment",), ("patient", "of", "for")),
+            "count_by_specialty": (("how many", "count"), ("doctor",), ("specialty",)),
+            "count_appointments": (("appointment",),),
+            "count_specialty_count": (("how many doctors are there in each specialty?",),),
+        }
+        # Rules whose pattern is a plain `^literal$` join the literal lookup,
+        # as long as the blood type and time steps and the combined regex
+        # would not answer the question with something else first
+        self._literal_rules = dict(self._LITERAL_RULES)
+        for name, pattern in self._rule_patterns:
+            for literal in _literal_texts(pattern) or ():
+                if (literal not in self._literal_rules
+                        and self._combined.match(literal).lastgroup == name
+                        and not self._match_blood_type_query(literal)
+                        and not self._match_time_query(literal)):
+                    self._literal_rules[literal] = name
+
+        # Every prefilter keyword gets a bit, so a question is reduced to the
+        # mask of keywords it contains in one pass over them
+        keywords = sorted({kw for groups in self._required_kw.values() for group in groups for kw in group})
+        bits = {kw: 1 << i for i, kw in enumerate(keywords)}
+        self._keyword_bits = tuple((kw, bits[kw]) for kw in keywords)
+
+        # The nested rule dicts flattened for the per-question path. Parallel
+        # to _rule_patterns, each rule's required keyword masks: a rule is a
+        # candidate if every mask shares a bit with the question's
+        self._rule_masks = tuple(
+            tuple(sum(bits[kw] for kw in group) for group in self._required_kw.get(name, ()))
+            for name, _ in self._rule_patterns
+        )
+        # Dispatching regex and rule groups per keyword mask, or None if no
+        # rule is a candidate
+        self._dispatch = {}
+        # Per rule its SQL, where each ? takes its value from the extracted
+        # groups, and the extractor
+        self._rule_sql = {}
+        for name, (sql, order) in self._sql_cache.items():
+            names = self.patterns[name]["sql"][1]
+            positions = tuple(names.index(param) for param in order)
+            self._rule_sql[name] = (sql, positions, self._rule_args.get(name))
+
     def _get_date_filter(self, number: str, unit: str) -> str:
         """Generate the date filter expression for time-based queries.
         
@@ -500,377 +879,333 @@ class Text2SQLModel:
             unit: Time unit (day/week/month/year or plural forms)
             
         Returns:
-            SQLite date filter expression with explicit dates
+            Start date of the period in SQLite format (YYYY-MM-DD)
         """
-        from datetime import datetime, timedelta
-        
-        # Get current date
-        current_date = datetime.now()
-        
         # Handle text numbers
-        if not number or isinstance(number, str) and number.lower() in ('a', 'the', 'this'):
+        if not number or str(number).lower() in ('a', 'the', 'this'):
             number = '1'
         num = int(number)
         
         # Normalize unit by removing plurals and converting to lowercase
         unit = unit.lower().rstrip('s')
-        
-        # Calculate the start date based on the unit
-        if unit == 'month':
-            # Simple month calculation (might not be exact for varying month lengths)
-            days_to_subtract = num * 30
-            start_date = current_date - timedelta(days=days_to_subtract)
-        elif unit == 'week':
-            start_date = current_date - timedelta(weeks=num)
-        elif unit == 'year':
-            start_date = current_date - timedelta(days=num*365)
-        else:  # days
-            start_date = current_date - timedelta(days=num)
-            
-        # Format dates in SQLite format (YYYY-MM-DD)
-        return f"'{start_date.strftime('%Y-%m-%d')}'"
-            
-    def _generate_time_query(self, number: str, unit: str) -> str:
-        """Generate a query with time-based filtering and analytics."""
-        date_filter = self._get_date_filter(number, unit)
-        
-        return f"""
-            WITH appointment_stats AS (
-                SELECT 
-                    COUNT(DISTINCT a.doctor_id) as total_doctors,
-                    COUNT(DISTINCT a.patient_id) as total_patients,
-                    COUNT(*) as total_appointments,
-                    ROUND(COUNT(*) * 1.0 / COUNT(DISTINCT DATE(a.date)), 2) as avg_daily_appointments
-                FROM appointments a
-                WHERE date(a.date) >= {date_filter}
-            )
-            SELECT 
-                a.date,
-                p.name as patient,
-                p.age,
-                p.blood_type,
-                d.name as doctor,
-                d.specialty,
-                a.reason,
-                stats.total_doctors,
-                stats.total_patients,
-                stats.total_appointments,
-                stats.avg_daily_appointments
-            FROM appointments a
-            JOIN patients p ON a.patient_id = p.patient_id
-            JOIN doctors d ON a.doctor_id = d.doctor_id
-            CROSS JOIN appointment_stats stats
-            WHERE date(a.date) >= {date_filter}
-            ORDER BY a.date DESC
-        """
 
-    def _extract_entities(self, doc) -> Dict:
-        """Extract entities and keywords from the text using spaCy."""
-        entities = {
-            "numbers": [],
-            "dates": [],
-            "names": [],
-            "blood_types": []
-        }
-        
-        # Extract numbers and dates
-        for token in doc:
-            if token.like_num:
-                entities["numbers"].append(token.text)
-            if token.ent_type_ == "DATE":
-                entities["dates"].append(token.text)
-                
-        # Extract names (look for capitalized words that aren't at start of sentence)
-        for token in doc:
-            if (token.text[0].isupper() and 
-                not token.is_sent_start and 
-                token.text.lower() not in {"dr", "dr.", "doctor"}):
-                entities["names"].append(token.text)
-                
-        # Look for blood types
-        blood_type_pattern = re.compile(r'[ABO]+[+-]')
-        for match in blood_type_pattern.finditer(doc.text):
-            entities["blood_types"].append(match.group())
+        # Filters are relative to today, so start over when the day changes
+        today = date.today()
+        if today != self._today:
+            self._date_cache.clear()
+            self._today = today
+
+        date_filter = self._date_cache.get((unit, num))
+        if date_filter is None:
+            if unit == 'month':
+                start_date = _months_before(today, num)
+            elif unit == 'week':
+                start_date = today - timedelta(weeks=num)
+            elif unit == 'year':
+                start_date = _months_before(today, num * 12)
+            else:  # days
+                start_date = today - timedelta(days=num)
+            # Format dates in SQLite format (YYYY-MM-DD)
+            date_filter = self._date_cache[(unit, num)] = start_date.isoformat()
+        return date_filter
             
-        return entities
+    def _keyword_mask(self, text: str) -> int:
+        """Return the bits of the prefilter keywords found in text."""
+        return sum(bit for kw, bit in self._keyword_bits if kw in text)
 
-    def _format_sql(self, sql: str) -> str:
-        """Format SQL query for better readability."""
-        return sqlparse.format(
-            sql.strip(),
-            reindent=True,
-            keyword_case='upper',
-            strip_comments=True
+    def _candidate_rules(self, text: str, mask: Optional[int] = None) -> Tuple[Tuple[str, str], ...]:
+        """Return the (name, pattern) rules whose required keywords are all in text."""
+        if mask is None:
+            mask = self._keyword_mask(text)
+        return tuple(
+            rule for rule, required in zip(self._rule_patterns, self._rule_masks)
+            if all(group & mask for group in required)
         )
 
-    def _match_exact_count_query(self, text: str) -> Optional[str]:
-        """Match exact count query patterns."""
-        count_patterns = {
-            "how many patients do we have?": "count_patients",
-            "how many doctors are there?": "count_doctors",
-            "how many appointments are there?": "count_appointments",
-            "how many doctors are there in each specialty?": "count_doctors_by_specialty",
-            "count total number of appointments": "count_appointments",
-            "count total number of patients": "count_patients"
-        }
-        return count_patterns.get(text)
-
-    def _match_blood_type_query(self, text: str) -> Optional[tuple]:
-        """Match blood type query patterns."""
-        logger.debug(f"Attempting to match blood type patterns in: {text}")
-        patterns = [
-            r"(?:blood\s+type|type)\s+([ABO][+-])",
-            r"(?:with|having)\s+([ABO][+-])",
-            r"list patients?\s+with\s+blood\s+type\s+([ABO][+-])"
-        ]
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                blood_type = match.group(1).upper()
-                logger.info(f"Found blood type: {blood_type}")
-                return blood_type
-        logger.debug("No blood type pattern matched")
-        return None
+    def _dispatcher(self, text: str) -> Optional[Tuple[re.Pattern, Dict[str, Tuple[int, int]]]]:
+        """Return the compiled regex of the candidate rules for text, and their groups."""
+        mask = self._keyword_mask(text)
+        try:
+            return self._dispatch[mask]
+        except KeyError:
+            pass
+        candidates = self._candidate_rules(text, mask)
+        if len(self._dispatch) >= DISPATCH_CACHE_SIZE:
+            self._dispatch.clear()
+        dispatch = self._dispatch[mask] = _compile_rules(candidates) if candidates else None
+        return dispatch
+
+    def _build_sql(self, name: str, *groups) -> Tuple[str, Tuple]:
+        """Return the SQL of a rule and its parameters from the captured groups."""
+        sql, positions, extract = self._rule_sql[name]
+        if not positions:
+            return sql, ()
+        values = extract(*groups) if extract else groups
+        return sql, tuple(values[i] for i in positions)
+
+    def _format_sql(self, sql: str) -> str:
+        """Tidy SQL assembled by the query builders for display."""
+        return _tidy_sql(sql)
+
+    def _match_blood_type_query(self, text: str) -> Optional[Tuple[str, str]]:
+        """Match blood type query patterns.
+
+        Returns:
+            The name of the blood type template and the blood type, or None
+        """
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Attempting to match blood type patterns in: {text}")
+        # Every blood type ends in a sign; without one the search can't match
+        match = self._BLOOD_RE.search(text) if "+" in text or "-" in text else None
+        if match is None:
+            logger.debug("No blood type pattern matched")
+            return None
+        if match.group("by_group"):
+            name = "blood_type"
+        elif match.group("by_of"):
+            # "of" alone is too common; only read it as a type after patients
+            if "patient" not in text and "people" not in text:
+                return None
+            name = "patient_blood_type"
+        else:
+            name = "patients_by_blood"
+        blood_type = match.group("blood_type").upper()
+        logger.info(f"Found blood type: {blood_type}")
+        return name, blood_type
 
     def _match_time_query(self, text: str) -> Optional[tuple]:
         """Match time-based query patterns."""
-        if "appointment" not in text:
+        if "appointment" not in text or not any(unit in text for unit in self._TIME_UNITS):
             return None
-        pattern = r"(?:in |from |during |the |last |past |recent )?(\d+|a|the|this)?\s*(day|week|month)s?"
-        match = re.search(pattern, text, re.IGNORECASE)
+        match = self._TIME_RE.search(text)
         if match:
             number = match.group(1) or "1"
             unit = match.group(2)
             return (number, unit)
         return None
 
-    def convert(self, text: str) -> Optional[str]:
-        """Convert natural language question to SQL using flexible matching.
-        
-        Args:
-            text: Natural language question about medical data
-            
+    def _match_rules_on(self, text: str, day: int) -> Optional[Tuple[str, Tuple]]:
+        """Run `_match_rules`; backs the case-insensitive rules cache.
+
+        `day` is today's ordinal, salting the key like in `_convert`.
+        """
+        return self._match_rules(text)
+
+    def _match_rules(self, text: str) -> Optional[Tuple[str, Tuple]]:
+        """Answer a lowercased question from the rules alone, without spaCy.
+
         Returns:
-            SQL query string or None if no pattern matches
+            (sql, params), or None when only the entity fallback is left
         """
-        logger.info(f"Converting query: {text}")
-        start_time = datetime.now()
-        
-        # Clean and normalize input
-        text = text.strip().lower()
-        logger.debug(f"Normalized text: {text}")
-        
-        # Step 1: Try exact count patterns
-        pattern_name = self._match_exact_count_query(text)
+        # Step 1: Try exact questions, without running any regex
+        pattern_name = self._literal_rules.get(text)
         if pattern_name:
-            return self._format_sql(self.patterns[pattern_name]["sql"](None))
+            return self._build_sql(pattern_name)
             
         # Step 2: Try blood type patterns
-        blood_type = self._match_blood_type_query(text)
-        if blood_type:
-            return self._format_sql(self.patterns["patients_by_blood"]["sql"](blood_type))
+        blood_match = self._match_blood_type_query(text)
+        if blood_match:
+            return self._build_sql(*blood_match)
             
         # Step 3: Try time-based patterns
         time_params = self._match_time_query(text)
         if time_params:
             number, unit = time_params
-            return self._format_sql(self.patterns["recent_appointments"]["sql"](number, unit))
+            return self._build_sql("recent_appointments", number, unit)
             
-        # Step 4: Try exact matches for common patterns
-        exact_patterns = {
-            "show all patients": "all_patients",
-            "list all doctors and their specialties": "all_doctors",
-            "show doctors who have the most appointments": "doctors_most_appointments"
-        }
-        pattern_name = exact_patterns.get(text)
+        # Step 4: Try flexible pattern matching
+        pattern_name = None
+        groups = ()
+        dispatch = self._dispatcher(text)
+        if dispatch:
+            combined, rule_groups = dispatch
+            match = combined.match(text)
+            if match:
+                pattern_name = match.lastgroup
+                start, end = rule_groups[pattern_name]
+                groups = match.groups()[start:end]
         if pattern_name:
-            return self._format_sql(self.patterns[pattern_name]["sql"](None))
-            
-        # Step 5: Try flexible pattern matching
-        for pattern_name, pattern_info in self.patterns.items():
-            match = re.search(pattern_info["pattern"], text, re.IGNORECASE)
-            if not match:
-                continue
-                
+            # Captured values the rule's extractor rejects, like digits int()
+            # refuses, fall through to the remaining steps
             try:
-                sql = None
-                try:
-                    if pattern_name == "doctor_appointments":
-                        sql = pattern_info["sql"](match.group(1))
-                        logger.info(f"Matched doctor appointments pattern for doctor: {match.group(1)}")
-                    elif pattern_name == "patient_appointments":
-                        sql = pattern_info["sql"](match.group(2))
-                        logger.info(f"Matched patient appointments pattern for patient: {match.group(2)}")
-                    elif pattern_name == "patient_age":
-                        sql = pattern_info["sql"](match.group(1))
-                        logger.info(f"Matched patient age pattern with age: {match.group(1)}")
-                    elif pattern_name == "doctors_with_min_appointments":
-                        threshold = int(re.search(r"more than (\d+)", text).group(1))
-                        sql = pattern_info["sql"](threshold)
-                        logger.info(f"Matched doctors with min appointments pattern, threshold: {threshold}")
-                    else:
-                        sql = pattern_info["sql"](None)
-                        logger.info(f"Matched pattern: {pattern_name}")
-                except Exception as e:
-                    logger.error(f"Error processing pattern {pattern_name}: {str(e)}")
-                    
-                if sql:
-                    return self._format_sql(sql)
-            except Exception:
-                continue
+                sql = self._build_sql(pattern_name, *groups)
+            except (IndexError, ValueError) as e:
+                logger.error(f"Error processing pattern {pattern_name}: {str(e)}")
+            else:
+                logger.info(f"Matched pattern {pattern_name} with {groups}")
+                return sql
                 
-        # Step 6: Fallback for common entities
+        # Step 5: Fallback for common entities
         if "patient" in text:
-            return self._format_sql(self.patterns["all_patients"]["sql"](None))
+            return self._build_sql("all_patients")
         elif "doctor" in text:
-            return self._format_sql(self.patterns["all_doctors"]["sql"](None))
+            return self._build_sql("all_doctors")
         elif "appointment" in text:
-            return self._format_sql(self.patterns["recent_appointments"]["sql"]("7", "days"))
-            
-        # Process text with spaCy for more complex queries
-        doc = nlp(text)
-        entities = self._extract_entities(doc)
-        query_type = self._determine_query_type(text)
-        
-        # Try pattern-based matching
-        match = self._match_query_pattern(text, query_type, entities, [])
-        if match:
-            return self._format_sql(match)
-            
+            return self._build_sql("recent_appointments", "7", "days")
+
         return None
-        """Convert natural language question to SQL query using NLP.
+
+    def convert(self, text: str) -> Optional[Tuple[str, Tuple]]:
+        """Convert natural language question to SQL using flexible matching.
         
+        Values taken from the question are never spliced into the SQL; they
+        are returned separately, for `cursor.execute(sql, params)`. Results
+        are cached, keyed by the question with its whitespace collapsed, so
+        repeated questions cost a dict lookup.
+
         Args:
             text: Natural language question about medical data
             
         Returns:
-            SQL query string or None if no pattern matches
+            (sql, params) with ? placeholders in the SQL, or None if no
+            pattern matches
         """
-        # Process text with spaCy
-        doc = nlp(text.lower().strip())
-        
-        # Extract entities
-        entities = self._extract_entities(doc)
-        
-        # Priority 1: Handle blood type queries
-        blood_type_patterns = [
-            r"(?:blood\s+type|type)\s+([ABO][+-])",
-            r"(?:with|having)\s+([ABO][+-])",
-            r"([ABO][+-])(?:\s+blood\s+type)?"
-        ]
-        
-        for pattern in blood_type_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                blood_type = match.group(1)
-                sql = self.patterns["patient_blood_type"]["sql"](blood_type)
-                return self._format_sql(sql)
-        
-        # Priority 2: Handle threshold-based queries
-        threshold_match = re.search(self.query_types["threshold"], text, re.IGNORECASE)
-        threshold_value = int(threshold_match.group(1)) if threshold_match else None
-        
-        # Try each pattern
-        for pattern_name, pattern_info in self.patterns.items():
-            match = re.search(pattern_info["pattern"], text, re.IGNORECASE)
-            if not match:
-                continue
-                
-            try:
-                sql = None
-                
-                if pattern_name == "recent_appointments":
-                    sql = pattern_info["sql"](int(match.group(1)), match.group(2))
-                elif pattern_name == "doctor_appointments":
-                    sql = pattern_info["sql"](match.group(1))
-                elif pattern_name == "patient_appointments":
-                    sql = pattern_info["sql"](match.group(2))
-                elif pattern_name == "patient_age":
-                    sql = pattern_info["sql"](match.group(1))
-                elif pattern_name == "doctors_with_min_appointments" and threshold_value:
-                    sql = pattern_info["sql"](threshold_value)
-                else:
-                    sql = pattern_info["sql"](None)
-                
-                if sql:
-                    return self._format_sql(sql)
-                    
-            except Exception as e:
-                continue  # Try next pattern if current one fails
+        start_ns = time.perf_counter_ns()
+        try:
+            return self._convert_cached(" ".join(text.split()), date.today().toordinal())
+        finally:
+            if logger.isEnabledFor(logging.INFO):
+                execution_time = (time.perf_counter_ns() - start_ns) / 1e9
+                logger.info(f"Query conversion completed in {execution_time:.2f} seconds")
+
+    def convert_batch(self, texts: List[str]) -> List[Optional[Tuple[str, Tuple]]]:
+        """Convert several questions, parsing the ones spaCy is needed for together.
+
+        Questions the rules answer never reach spaCy. With `use_spacy` set,
+        the others are parsed in one `nlp.pipe` run instead of one call each.
+
+        Args:
+            texts: Natural language questions about medical data
+
+        Returns:
+            The result of `convert` for each question, in order
+        """
+        questions = [" ".join(text.split()) for text in texts]
+        if self.use_spacy:
+            day = date.today().toordinal()
+            pending = [q for q in dict.fromkeys(questions)
+                       if self._rules_cached(q.lower(), day) is None and self._looks_like_complex(q.lower())]
+            if pending:
+                docs = _get_nlp().pipe(pending, batch_size=SPACY_BATCH_SIZE)
+                self._docs = dict(zip(pending, docs))
+        try:
+            return [self.convert(question) for question in questions]
+        finally:
+            self._docs = {}
+
+    def _convert(self, text: str, day: int) -> Optional[Tuple[str, Tuple]]:
+        """Convert a stripped question; backs the `convert` cache.
+
+        Args:
+            text: Natural language question, whitespace already collapsed
+            day: Today's ordinal, only there to salt the cache key so relative
+                date filters are rebuilt once the day changes
+        """
+        logger.info(f"Converting query: {text}")
         
-        end_time = datetime.now()
-        execution_time = (end_time - start_time).total_seconds()
-        logger.info(f"Query conversion completed in {execution_time:.2f} seconds")
+        # Normalize input, keeping the original casing for names
+        question = text
+        text = question.lower()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Normalized text: {text}")
         
-        if sql:
-            logger.debug(f"Generated SQL: {sql}")
-            return self._format_sql(sql)
-        else:
-            logger.warning(f"No matching pattern found for query: {text}")
+        result = self._rules_cached(text, day) or self._convert_with_entities(question, text)
+        if result is None:
+            logger.warning(f"No matching pattern found for query: {question}")
+        return result
+
+    def _looks_like_complex(self, text: str) -> bool:
+        """Tell whether the entity fallback has a query builder for a lowercased question.
+
+        Mirrors the routing of `_match_query_pattern`, so questions it would
+        turn down never get their entities extracted or parsed by spaCy.
+        """
+        return (bool(self._terms_in(text) & self._ENTITY_TABLES)
+                or self._determine_query_type(text) == "COUNT"
+                or "list" in text or "show" in text)
+
+    def _convert_with_entities(self, question: str, text: str) -> Optional[Tuple[str, Tuple]]:
+        """Build SQL from the entities of a question no rule answers.
+
+        Args:
+            question: The stripped question with its original capitalization
+            text: The same question lowercased
+        """
+        if not self._looks_like_complex(text):
             return None
+
+        # Extract entities for more complex queries
+        entities = self._extract_entities(question)
+        query_type = self._determine_query_type(text)
+        
+        # Try pattern-based matching
+        match = self._match_query_pattern(text, query_type, entities, [])
+        if match:
+            sql, params = match
+            return self._format_sql(sql), tuple(params)
+            
+        return None
             
     def _determine_query_type(self, text: str) -> str:
-        """Determine the type of query being asked."""
-        if any(phrase in text for phrase in ["how many", "count", "number of"]):
-            return "COUNT"
-        elif any(phrase in text for phrase in ["show me", "list", "what are", "display"]):
-            return "SELECT"
-        elif any(phrase in text for phrase in ["average", "mean"]):
-            return "AGGREGATE"
-        else:
-            return "SELECT"  # Default to SELECT
+        """Determine the type of query being asked from the lowercased question."""
+        return next(
+            (query_type for query_type, phrases in self._QUERY_TYPE_PHRASES
+             if any(phrase in text for phrase in phrases)),
+            "SELECT"  # Default to SELECT
+        )
             
-    def _extract_entities(self, doc) -> dict:
-        """Extract relevant entities from the question."""
+    def _extract_entities(self, text: str) -> dict:
+        """Extract relevant entities from the question.
+
+        Args:
+            text: The question with its original capitalization
+
+        Returns:
+            Dict with person names (each a dict with "name" and "is_doctor"),
+            dates, blood types, and the age and gender mentioned, if any
+        """
+        lowered = text.lower()
         entities = {
-            "persons": [],
-            "dates": [],
+            "persons": self._extract_persons(text),
+            "dates": self._DATE_RE.findall(text),
             "age": None,
             "gender": None,
-            "conditions": []
+            "conditions": [],
+            # A blood type is a whole word, so a set lookup per word will do
+            "blood_types": [word for word in (w.strip(",.;:?!").upper() for w in text.split())
+                            if word in _VALID_BLOOD]
         }
-        
-        # Extract person names
-        for ent in doc.ents:
-            if ent.label_ == "PERSON":
-                entities["persons"].append(ent.text)
-        
-        # Look for dates (including years)
-        for token in doc:
-            if token.like_num and len(token.text) == 4 and token.text.startswith("2"):
-                entities["dates"].append(token.text)
                 
         # Check for age references
-        age_pattern = re.search(r"(\d+)\s*(?:year(?:s)?(?:\s+old)?|yo)", doc.text.lower())
-        if age_pattern:
-            entities["age"] = age_pattern.group(1)
+        age_match = self._AGE_RE.search(lowered)
+        if age_match:
+            entities["age"] = age_match.group(1)
             
-        # Check for gender
-        if "female" in doc.text.lower() or "women" in doc.text.lower():
-            entities["gender"] = "F"
-        elif "male" in doc.text.lower() or "men" in doc.text.lower():
-            entities["gender"] = "M"
+        # Check for gender, as whole words so "appointments" isn't "men"
+        gender_match = self._GENDER_RE.search(lowered)
+        if gender_match:
+            entities["gender"] = "F" if gender_match.group(1) else "M"
             
         return entities
+
+    def _extract_persons(self, text: str) -> List[Dict]:
+        """Find person names, from capitalized words or from spaCy if enabled."""
+        if self.use_spacy:
+            doc = self._docs.get(text)
+            found = _persons_in(doc) if doc is not None else _parse(text)
+            return [{"name": name, "is_doctor": is_doctor} for name, is_doctor in found]
+        persons = []
+        for match in self._PERSON_RE.finditer(text):
+            title, name = match.groups()
+            # A capitalized first word just starts the sentence
+            if match.start() == 0 and not title:
+                continue
+            persons.append({"name": name, "is_doctor": title is not None})
+        return persons
         
-    def _extract_conditions(self, doc) -> List[Tuple[str, str, str]]:
-        """Extract conditions from the question."""
-        conditions = []
-        
-        # Age conditions
-        age_words = ["over", "under", "older", "younger"]
-        for token in doc:
-            if token.like_num:
-                age_context = [t.text.lower() for t in token.children]
-                age_head = token.head.text.lower()
-                if any(word in age_context + [age_head] for word in age_words):
-                    op = ">" if any(w in age_context + [age_head] for w in ["over", "older"]) else "<"
-                    conditions.append(("age", op, token.text))
-                    
-        return conditions
-
-    def _match_query_pattern(self, text: str, query_type: str, entities: dict, conditions: List[Tuple]) -> str:
-        """Match question against common query patterns and generate SQL."""
+    def _match_query_pattern(self, text: str, query_type: str, entities: dict,
+                             conditions: List[Tuple]) -> Optional[Tuple[str, List]]:
+        """Match question against common query patterns and generate SQL and its parameters."""
         
         # 1. Appointment queries
         if self._is_appointment_query(text):
@@ -894,113 +1229,112 @@ class Text2SQLModel:
             
         return None
         
+    def _terms_in(self, text: str) -> frozenset:
+        """Return the table names whose variations appear as words in text."""
+        last_text, terms = self._last_terms
+        if text != last_text:
+            terms = frozenset(self._term_lookup[word] for word in self._WORD_RE.findall(text)
+                              if word in self._term_set)
+            self._last_terms = (text, terms)
+        return terms
+
     def _is_appointment_query(self, text: str) -> bool:
         """Check if the question is about appointments."""
-        return any(word in text for word in self.term_map["appointment"])
+        return "appointment" in self._terms_in(text)
         
     def _is_patient_query(self, text: str) -> bool:
         """Check if the question is about patients."""
-        return any(word in text for word in self.term_map["patient"])
+        return "patient" in self._terms_in(text)
         
     def _is_medication_query(self, text: str) -> bool:
         """Check if the question is about medications or prescriptions."""
-        return any(word in text for word 
-                  in self.term_map["medication"] + self.term_map["prescription"])
-
-    def _build_appointment_query(self, text: str, entities: dict) -> str:
-        """Build SQL for appointment-related queries."""
-        # Base query using schema-defined keys
-        query = f"""
-            SELECT a.date, p.name as patient_name, d.name as doctor_name, a.reason
-            FROM appointments a
-            JOIN patients p ON a.patient_id = p.patient_id
-            JOIN doctors d ON a.doctor_id = d.doctor_id
-        """
-        
+        terms = self._terms_in(text)
+        return "medication" in terms or "prescription" in terms
+
+    def _build_appointment_query(self, text: str, entities: dict) -> Tuple[str, List]:
+        """Build SQL and its parameters for appointment-related queries."""
+        parts = [APPT_BASE_SQL]
         conditions = []
+        params = []
         
         # Add doctor/patient filters
-        if entities["persons"]:
-            for person in entities["persons"]:
-                name = person["name"].replace("'", "''")
-                if person.get("is_doctor"):
-                    conditions.append(f"d.name LIKE '%{name}%'")
-                else:
-                    conditions.append(f"p.name LIKE '%{name}%'")
+        for person in entities["persons"]:
+            if person.get("is_doctor"):
+                conditions.append("d.name LIKE '%' || ? || '%'")
+            else:
+                conditions.append("p.name LIKE '%' || ? || '%'")
+            params.append(person["name"])
                 
-        # Add date filters
+        # Add date filters; a year or a full date both match as a prefix
         if entities["dates"]:
-            date = entities["dates"][0]
-            if "-" in date:  # If it's a full date with month
-                conditions.append(f"a.date LIKE '{date}%'")
-            else:  # If it's just a year
-                conditions.append(f"a.date LIKE '{date}%'")
+            conditions.append("a.date LIKE ? || '%'")
+            params.append(entities["dates"][0])
             
         # Add WHERE clause if needed
         if conditions:
-            query += "\nWHERE " + " AND ".join(conditions)
+            parts.append("WHERE " + " AND ".join(conditions))
             
         # Add ordering
-        query += "\nORDER BY a.date DESC"
+        parts.append("ORDER BY a.date DESC")
         
-        return query
+        return "\n".join(parts), params
 
-    def _build_patient_query(self, text: str, entities: dict, conditions: List[Tuple]) -> str:
-        """Build SQL for patient-related queries."""
+    def _build_patient_query(self, text: str, entities: dict, conditions: List[Tuple]) -> Tuple[str, List]:
+        """Build SQL and its parameters for patient-related queries."""
         # Base query
-        query = "SELECT name, age, gender FROM patients"
+        query = PATIENT_BASE_SQL
         
         where_clauses = []
+        params = []
         
-        # Add age conditions
+        # Add age conditions; the operator comes from our own table, not the text
         for field, op, value in conditions:
             if field == "age":
-                where_clauses.append(f"age {op} {value}")
+                where_clauses.append(f"age {op} ?")
+                params.append(int(value))
                 
         # Add gender condition
         if entities["gender"]:
-            where_clauses.append(f"gender = '{entities['gender']}'")
+            where_clauses.append("gender = ?")
+            params.append(entities["gender"])
             
         # Add WHERE clause if needed
         if where_clauses:
             query += "\nWHERE " + " AND ".join(where_clauses)
             
-        return query
-
-    def _build_medication_query(self, text: str, entities: dict) -> str:
-        """Build SQL for medication/prescription-related queries."""
-        query = f"""
-            SELECT m.name as medication, p.dosage, p.date, pt.name as patient_name
-            FROM prescriptions p
-            JOIN medications m ON p.{self.keys['prescriptions']['foreign_keys']['med_id']['column']} = m.{self.keys['medications']['primary_key']}
-            JOIN patients pt ON p.{self.keys['prescriptions']['foreign_keys']['patient_id']['column']} = pt.{self.keys['patients']['primary_key']}
-        """
-        
+        return query, params
+
+    def _build_medication_query(self, text: str, entities: dict) -> Tuple[str, List]:
+        """Build SQL and its parameters for medication/prescription-related queries."""
+        parts = [MEDICATION_BASE_SQL]
         conditions = []
+        params = []
         
         # Add patient filter
         if entities["persons"]:
-            patient = entities["persons"][0].replace("'", "''")
-            conditions.append(f"pt.name LIKE '%{patient}%'")
+            conditions.append("pt.name LIKE '%' || ? || '%'")
+            params.append(entities["persons"][0]["name"])
             
         # Add date filter
         if entities["dates"]:
-            conditions.append(f"p.date LIKE '{entities['dates'][0]}%'")
+            conditions.append("p.date LIKE ? || '%'")
+            params.append(entities["dates"][0])
             
         # Add WHERE clause if needed
         if conditions:
-            query += "\nWHERE " + " AND ".join(conditions)
+            parts.append("WHERE " + " AND ".join(conditions))
             
         # Add ordering
-        query += "\nORDER BY p.date DESC"
+        parts.append("ORDER BY p.date DESC")
         
-        return query
+        return "\n".join(parts), params
 
-    def _build_count_query(self, text: str, entities: dict, conditions: List[Tuple]) -> str:
-        """Build SQL for count queries."""
+    def _build_count_query(self, text: str, entities: dict, conditions: List[Tuple]) -> Tuple[str, List]:
+        """Build SQL and its parameters for count queries."""
         # Determine what we're counting based on the text
-        for table, terms in self.term_map.items():
-            if any(term in text.lower() for term in terms):
+        mentioned = self._terms_in(text)
+        for table in self.term_map:
+            if table in mentioned:
                 count_target = table + "s"  # Add 's' for plural
                 break
         else:
@@ -1010,299 +1344,29 @@ class Text2SQLModel:
         query = f"SELECT COUNT(*) as count FROM {count_target}"
         
         where_clauses = []
+        params = []
         
         # Add conditions based on the table we're counting
         if count_target == "patients":
             if entities["gender"]:
-                where_clauses.append(f"gender = '{entities['gender']}'")
+                where_clauses.append("gender = ?")
+                params.append(entities["gender"])
             for field, op, value in conditions:
                 if field == "age":
-                    where_clauses.append(f"age {op} {value}")
+                    where_clauses.append(f"age {op} ?")
+                    params.append(int(value))
         
         # Add WHERE clause if we have conditions
         if where_clauses:
             query += "\nWHERE " + " AND ".join(where_clauses)
         
-        return query
+        return query, params
 
-    def _build_list_query(self, text: str) -> str:
-        """Build SQL for general list queries."""
+    def _build_list_query(self, text: str) -> Optional[Tuple[str, List]]:
+        """Build SQL for general list queries; table names can't be parameters."""
         # Try to determine which table to query
-        for table in self.schema:
+        for table in db_schema.REGISTRY:
             if table.lower() in text:
-                return f"SELECT * FROM {table} LIMIT 100"
+                return f"SELECT * FROM {table} LIMIT 100", []
         
         return None
-
-    def _handle_complex_query(self, analysis: Dict) -> str:
-        """Handle complex queries with multiple components."""
-        if "average" in analysis["metrics"]:
-            return self._build_average_query(analysis)
-        elif "most" in analysis["metrics"] or "least" in analysis["metrics"]:
-            return self._build_superlative_query(analysis)
-        else:
-            return self._build_multi_table_query(analysis)
-            
-    def _build_average_query(self, analysis: Dict) -> str:
-        """Build queries for averages (e.g., average age by specialty)."""
-        base_table = self._identify_base_table(analysis)
-        group_by = self._identify_group_by(analysis)
-        
-        query = f"""SELECT {group_by}, ROUND(AVG("""
-        
-        # Determine what we're averaging
-        if "age" in analysis["entities"]:
-            query += "p.age"
-        else:
-            query += "COUNT(*)"
-            
-        query += f"), 1) as average\nFROM {base_table} "
-        
-        # Add necessary joins
-        query += self._build_joins(analysis)
-        
-        # Add grouping
-        query += f"\nGROUP BY {group_by}"
-        
-        # Add ordering
-        query += "\nORDER BY average DESC"
-        
-        return query
-        
-    def _build_superlative_query(self, analysis: Dict) -> str:
-        """Build queries for finding maximum/minimum counts."""
-        base_table = self._identify_base_table(analysis)
-        count_target = self._identify_count_target(analysis)
-        
-        query = f"""SELECT {count_target}, COUNT(*) as count 
-                   FROM {base_table} """
-        
-        # Add necessary joins
-        query += self._build_joins(analysis)
-        
-        # Add grouping
-        query += f"\nGROUP BY {count_target}"
-        
-        # Add ordering based on most/least
-        direction = "DESC" if "most" in analysis["metrics"] else "ASC"
-        query += f"\nORDER BY count {direction}"
-        query += "\nLIMIT 1"
-        
-        return query
-        
-    def _build_multi_table_query(self, analysis: Dict) -> str:
-        """Build complex queries involving multiple tables."""
-        # For medication prescriptions for a specific patient
-        if "medications" in str(analysis) and any(not p.get("is_doctor") for p in analysis["entities"].get("persons", [])):
-            return self._build_patient_medications_query(analysis)
-            
-        # Start with base table and main columns
-        base_table = self._identify_base_table(analysis)
-        columns = self._identify_columns(analysis)
-        
-        query = f"SELECT {columns}\nFROM {base_table} "
-        
-        # Add necessary joins
-        query += self._build_joins(analysis)
-        
-        # Add conditions
-        conditions = self._build_conditions(analysis)
-        if conditions:
-            query += f"\nWHERE {conditions}"
-            
-        # Add any group by
-        group_by = self._identify_group_by(analysis)
-        if group_by:
-            query += f"\nGROUP BY {group_by}"
-            
-        return query
-        
-    def _build_patient_medications_query(self, analysis: Dict) -> str:
-        """Build query for patient's medications."""
-        # Find the patient name
-        patient_name = next(
-            person["name"] for person in analysis["entities"].get("persons", [])
-            if not person.get("is_doctor")
-        )
-        
-        # Build the specific query for medications
-        query = """
-            SELECT m.name as medication, p.dosage, p.date
-            FROM prescriptions p
-            JOIN medications m ON p.med_id = m.med_id
-            JOIN patients pa ON p.patient_id = pa.patient_id
-            WHERE pa.name = ?
-            ORDER BY p.date DESC
-        """.replace("?", f"'{patient_name}'")
-        
-        return query
-        
-    def _build_joins(self, analysis: Dict) -> str:
-        """Build necessary JOIN clauses based on analysis."""
-        base_table = self._identify_base_table(analysis)
-        joins = []
-        tables_needed = set()
-        
-        # Add tables based on entities mentioned
-        if analysis["entities"]["persons"]:
-            for person in analysis["entities"]["persons"]:
-                if person["is_doctor"]:
-                    tables_needed.add("doctors")
-                else:
-                    tables_needed.add("patients")
-                    
-        if "medications" in str(analysis) or "prescriptions" in str(analysis):
-            tables_needed.update(["medications", "prescriptions"])
-            
-        # Build JOIN clauses based on base table
-        if base_table == "prescriptions":
-            joins.extend([
-                "JOIN medications m ON prescriptions.med_id = m.med_id",
-                "JOIN patients pa ON prescriptions.patient_id = pa.patient_id"
-            ])
-        elif base_table == "appointments":
-            joins.extend([
-                "JOIN patients p ON appointments.patient_id = p.patient_id",
-                "JOIN doctors d ON appointments.doctor_id = d.doctor_id"
-            ])
-        else:
-            # Add other necessary joins based on context
-            if "patients" in tables_needed and base_table != "patients":
-                joins.append(f"JOIN patients p ON {base_table}.patient_id = p.patient_id")
-            if "doctors" in tables_needed and base_table != "doctors":
-                joins.append(f"JOIN doctors d ON {base_table}.doctor_id = d.doctor_id")
-            if "medications" in tables_needed and base_table != "medications":
-                joins.append(f"JOIN medications m ON prescriptions.med_id = m.med_id")
-                               
-        return "\n".join(joins)
-        
-    def _add_time_context(self, sql: str, time_context: Dict) -> str:
-        """Add time-based conditions to a query."""
-        if "WHERE" in sql:
-            connector = "AND"
-        else:
-            connector = "WHERE"
-            
-        if time_context["unit"] == "month":
-            sql += f"\n{connector} date >= date('now', '-1 month')"
-        elif time_context["unit"] == "year":
-            sql += f"\n{connector} date >= date('now', '-1 year')"
-        elif time_context["unit"] == "week":
-            sql += f"\n{connector} date >= date('now', '-7 days')"
-            
-        return sql
-        
-    def _identify_base_table(self, analysis: Dict) -> str:
-        """Identify the main table for the query based on analysis."""
-        # Check query focus
-        if "medications" in analysis["metrics"] or any("medication" in str(e) for e in analysis["entities"]["persons"]):
-            return "medications"
-        
-        for person in analysis["entities"].get("persons", []):
-            if person.get("is_doctor"):
-                return "doctors"
-            else:
-                if "prescriptions" in str(analysis):
-                    return "prescriptions"
-                elif "appointments" in str(analysis):
-                    return "appointments"
-                return "patients"
-                
-        # Default mappings based on common terms
-        term_table_map = {
-            "age": "patients",
-            "specialty": "doctors",
-            "appointment": "appointments",
-            "prescription": "prescriptions",
-            "medication": "medications"
-        }
-        
-        for term, table in term_table_map.items():
-            if term in str(analysis).lower():
-                return table
-                
-        return "patients"  # Default to patients if no clear indication
-        
-    def _identify_columns(self, analysis: Dict) -> str:
-        """Identify which columns to select based on analysis."""
-        base_table = self._identify_base_table(analysis)
-        
-        if "metrics" in analysis and analysis["metrics"]:
-            if "average" in analysis["metrics"]:
-                return "ROUND(AVG(p.age), 1) as average_age"
-            elif "count" in analysis["metrics"]:
-                return "COUNT(*) as count"
-                
-        # Default columns based on table
-        table_columns = {
-            "patients": "p.name, p.age, p.gender",
-            "doctors": "d.name, d.specialty",
-            "appointments": "a.date, p.name as patient_name, d.name as doctor_name, a.reason",
-            "medications": "m.name as medication, m.manufacturer",
-            "prescriptions": "m.name as medication, p.dosage, p.date, pa.name as patient_name"
-        }
-        
-        return table_columns.get(base_table, "*")
-        
-    def _identify_count_target(self, analysis: Dict) -> str:
-        """Identify what we're counting in count queries."""
-        base_table = self._identify_base_table(analysis)
-        
-        # Map tables to their typical count targets
-        count_targets = {
-            "patients": "p.name",
-            "doctors": "d.name",
-            "appointments": "a.date",
-            "medications": "m.name",
-            "prescriptions": "p.date"
-        }
-        
-        return count_targets.get(base_table, "*")
-        
-    def _identify_group_by(self, analysis: Dict) -> str:
-        """Identify GROUP BY clause based on analysis."""
-        if "specialty" in str(analysis):
-            return "d.specialty"
-        elif any(person.get("is_doctor") for person in analysis["entities"].get("persons", [])):
-            return "d.name, d.doctor_id"
-        elif "medications" in str(analysis):
-            return "m.name, m.med_id"
-            
-        return ""
-        
-    def _build_conditions(self, analysis: Dict) -> str:
-        """Build WHERE clause conditions from analysis."""
-        conditions = []
-        
-        # Handle person names
-        for person in analysis["entities"].get("persons", []):
-            name = person["name"].replace("'", "''")
-            if person.get("is_doctor"):
-                conditions.append(f"d.name LIKE '%{name}%'")
-            else:
-                conditions.append(f"pa.name = '{name}'")
-                
-        # Handle age conditions
-        for condition in analysis.get("conditions", []):
-            if condition["type"] == "age":
-                conditions.append(f"p.age {condition['operator']} {condition['value']}")
-                
-        # Handle gender
-        if analysis["entities"].get("gender"):
-            conditions.append(f"p.gender = '{analysis['entities']['gender']}'")
-            
-        # Handle time context
-        if analysis.get("time_context"):
-            if analysis["time_context"]["unit"] == "month":
-                conditions.append("p.date >= date('now', '-1 month')")
-            elif analysis["time_context"]["unit"] == "year":
-                conditions.append("p.date >= date('now', '-1 year')")
-                
-        return " AND ".join(conditions) if conditions else ""
-        
-    def schema_text(self) -> str:
-        """Get a text representation of the database schema."""
-        parts = []
-        for table, cols in (self.schema or {}).items():
-            parts.append(f"{table}({', '.join(cols)})")
-        return "; ".join(parts)
\ No newline at end of file
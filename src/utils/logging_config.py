@@ -1,38 +1,100 @@
 """
 Configure logging for the application.
 """
+import atexit
+import collections
 import logging
 import os
-from datetime import datetime
+import queue
+import threading
+from logging.handlers import MemoryHandler, QueueHandler, QueueListener, RotatingFileHandler
+from typing import List, Optional
+
+# Size at which the log file is rotated, and how many old files are kept
+LOG_MAX_BYTES = 10_000_000
+LOG_BACKUP_COUNT = 5
+
+# Records held before they are written to the log file; an error is
+# written straight away, together with everything held before it
+LOG_BUFFER_RECORDS = 1024
+
+# Formatted lines kept in memory for recent_logs()
+LOG_TAIL_LINES = 10
+
+
+class TailHandler(logging.Handler):
+    """Keep the last few formatted records in memory."""
+
+    def __init__(self, size: int = LOG_TAIL_LINES):
+        super().__init__()
+        self.lines = collections.deque(maxlen=size)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.lines.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+
+_tail = TailHandler()
+
+# Writes queued records to the real handlers on a background thread; set
+# by the first setup_logging() call
+_listener: Optional[QueueListener] = None
+_setup_lock = threading.Lock()
+
 
 def setup_logging(log_dir: str = "logs") -> None:
     """
     Set up logging configuration for the application.
-    
+
+    Loggers only put records on a queue; a listener thread writes them to
+    the log file and the console, so logging calls don't wait on file I/O.
+    File writes are batched, and the last few lines are also kept in memory
+    for `recent_logs()`.
+    Only the first call configures anything, so scripts that are re-run in
+    the same process, like the Streamlit app, don't open a new file each time.
+
     Args:
         log_dir: Directory to store log files
     """
-    # Create logs directory if it doesn't exist
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
-    
-    # Create log filename with timestamp
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    log_file = os.path.join(log_dir, f"query_system_{timestamp}.log")
-    
-    # Configure logging
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_file),
-            logging.StreamHandler()
-        ]
-    )
-    
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+
+        # Create logs directory if it doesn't exist
+        os.makedirs(log_dir, exist_ok=True)
+
+        # One log file, rotated by size, rather than a new file per start
+        log_file = os.path.join(log_dir, "query_system.log")
+        file_handler = RotatingFileHandler(log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT)
+
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+        stream_handler = logging.StreamHandler()
+        for handler in (file_handler, stream_handler, _tail):
+            handler.setFormatter(formatter)
+        buffered_file = MemoryHandler(LOG_BUFFER_RECORDS, flushLevel=logging.ERROR, target=file_handler)
+        handlers = [buffered_file, stream_handler, _tail]
+
+        # Configure logging
+        log_queue = queue.SimpleQueue()
+        _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+        root = logging.getLogger()
+        root.setLevel(logging.INFO)
+        root.addHandler(QueueHandler(log_queue))
+
     # Create logger
     logger = logging.getLogger("QuerySystem")
     logger.setLevel(logging.INFO)
-    
+
     # Log startup message
-    logger.info("Logging system initialized")
\ No newline at end of file
+    logger.info("Logging system initialized")
+
+
+def recent_logs() -> List[str]:
+    """Return the last LOG_TAIL_LINES formatted log lines, oldest first."""
+    return list(_tail.lines)
@@ -1,7 +1,11 @@
 """Shared utility functions for the medical NL→SQL demo."""
+import atexit
+import itertools
 import logging
 import os
-from typing import Any, Dict, Optional
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Iterable, Optional
 import sqlite3
 from pathlib import Path
 
@@ -9,9 +13,21 @@ from config import LOG_DIR, LOG_FILE, LOG_FORMAT, LOG_LEVEL
 
 
 def setup_logging(name: str) -> logging.Logger:
-    """Configure logging with consistent format across modules."""
+    """Configure logging with consistent format across modules.
+
+    The logger only puts records on a queue; a listener thread, kept on the
+    logger as `queue_listener`, writes them to the log file. Calling this
+    again for the same name returns the logger as it is.
+    """
     logger = logging.getLogger(name)
+    # Configured by an earlier call; adding handlers again would write every
+    # record once more per call
+    if logger.handlers:
+        return logger
     logger.setLevel(getattr(logging, LOG_LEVEL))
+    # The file handler below is the only output; don't also pass records to
+    # handlers on the root logger
+    logger.propagate = False
 
     # Ensure log directory exists
     log_dir = Path(LOG_DIR)
@@ -19,7 +35,11 @@ def setup_logging(name: str) -> logging.Logger:
     
     handler = logging.FileHandler(log_dir / LOG_FILE)
     handler.setFormatter(logging.Formatter(LOG_FORMAT))
-    logger.addHandler(handler)
+    log_queue = queue.SimpleQueue()
+    logger.queue_listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    logger.queue_listener.start()
+    atexit.register(logger.queue_listener.stop)
+    logger.addHandler(QueueHandler(log_queue))
     
     return logger
 
@@ -40,13 +60,22 @@ def format_sql_error(e: Exception) -> str:
     """Format a SQLite error for user display, removing sensitive details."""
     msg = str(e)
     # Remove any embedded values or stack traces
-    if "near " in msg:
-        msg = msg.split("near")[0].strip()
+    head, sep, _ = msg.partition("near ")
+    if sep:
+        msg = head.strip()
     return f"SQL error: {msg}"
 
 
-def truncate_results(results: list, max_rows: int = 1000) -> tuple[list, bool]:
-    """Truncate query results and return (truncated_results, was_truncated)."""
-    if len(results) > max_rows:
-        return results[:max_rows], True
-    return results, False
\ No newline at end of file
+# Returned by next() once the results are exhausted
+_NO_ROW = object()
+
+
+def truncate_results(results: Iterable, max_rows: int = 1000) -> tuple[list, bool]:
+    """Truncate query results and return (truncated_results, was_truncated).
+
+    `results` can be any iterable, such as a cursor; at most `max_rows + 1`
+    rows are read from it.
+    """
+    rows = iter(results)
+    head = list(itertools.islice(rows, max_rows))
+    return head, next(rows, _NO_ROW) is not _NO_ROW
\ No newline at end of file
@@ -1,27 +1,55 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import sqlite3
 import json
+import itertools
 import os
+import re
 import logging
+import shutil
 from pathlib import Path
-from datetime import datetime, timedelta
-import random
+from datetime import date, datetime, timedelta
 from faker import Faker
-from src.utils.logging_config import setup_logging
+from src.database.db import execute_select
+from src.database.pool import get_pool
+from src.nl_to_sql.text2sql_model import Text2SQLModel
+from src.utils.logging_config import recent_logs, setup_logging
 
 # Initialize logging
 setup_logging()
 logger = logging.getLogger("QuerySystem.UI")
 
-# Initialize Faker
-fake = Faker()
+# Tables created by generate_sample_database
+SAMPLE_TABLES = frozenset(("patients", "doctors", "appointments"))
 
-def generate_sample_database(db_path="medical.db"):
-    """Generate a sample medical database."""
-    with sqlite3.connect(db_path) as conn:
-        # Create tables
-        conn.executescript("""
+# Seed for the sample data, so every generated database is the same
+SAMPLE_SEED = 42
+
+# Most distinct Faker names and sentences drawn per database; rows sample
+# from these pools rather than calling Faker once per row
+NAME_POOL_SIZE = 200
+SENTENCE_POOL_SIZE = 50
+
+# Sample database built ahead of time by tools/build_seed_db.py
+SEED_DB_PATH = Path(__file__).resolve().parent / "assets" / "medical.seed.db"
+
+def generate_sample_database(db_path="medical.db", seed=SAMPLE_SEED):
+    """Generate a sample medical database.
+
+    The day the dates are centred on is stored as the database's
+    user_version, so `install_sample_database` can move them to today.
+    """
+    # Autocommit mode, so the inserts below run in the one transaction we open
+    with sqlite3.connect(db_path, isolation_level=None) as conn:
+        # Sample data is throwaway: keep the rollback journal in memory and
+        # don't wait for fsync
+        conn.executescript("PRAGMA journal_mode=MEMORY; PRAGMA synchronous=OFF;")
+        
+        # Create tables, unless an earlier run already did
+        existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        if not SAMPLE_TABLES <= existing:
+            conn.executescript("""
             CREATE TABLE IF NOT EXISTS patients (
                 patient_id INTEGER PRIMARY KEY,
                 name TEXT NOT NULL,
@@ -45,39 +73,79 @@ def generate_sample_database(db_path="medical.db"):
                 FOREIGN KEY (patient_id) REFERENCES patients (patient_id),
                 FOREIGN KEY (doctor_id) REFERENCES doctors (doctor_id)
             );
-        """)
+            """)
+        
+        # Generate sample data; every column is drawn a whole column at a
+        # time, the Faker text as indexes into small pools made up front
+        rng = np.random.default_rng(seed)
+        fake = Faker()
+        fake.seed_instance(seed)
+        n_patients, n_doctors, n_appointments = 50, 10, 100
+        name_pool = [fake.name() for _ in range(min(n_patients + n_doctors, NAME_POOL_SIZE))]
+        sentence_pool = [fake.sentence(nb_words=4) for _ in range(min(n_appointments, SENTENCE_POOL_SIZE))]
+        
+        def pick(pool, size):
+            return [pool[i] for i in rng.integers(0, len(pool), size=size)]
         
-        # Generate sample data
         # Patients
-        patients = [(i, fake.name(), random.randint(18, 90), 
-                    random.choice(['M', 'F']),
-                    random.choice(['A+', 'A-', 'B+', 'B-', 'O+', 'O-', 'AB+', 'AB-']))
-                   for i in range(1, 51)]
+        patients = zip(
+            range(1, n_patients + 1),
+            pick(name_pool, n_patients),
+            rng.integers(18, 91, size=n_patients).tolist(),
+            rng.choice(['M', 'F'], size=n_patients).tolist(),
+            rng.choice(['A+', 'A-', 'B+', 'B-', 'O+', 'O-', 'AB+', 'AB-'], size=n_patients).tolist(),
+        )
         
         # Doctors
         specialties = ['Cardiology', 'Neurology', 'Pediatrics', 'Oncology', 'General Practice']
-        doctors = [(i, f"Dr. {fake.name()}", random.choice(specialties))
-                  for i in range(1, 11)]
+        doctors = zip(
+            range(1, n_doctors + 1),
+            [f"Dr. {name}" for name in pick(name_pool, n_doctors)],
+            rng.choice(specialties, size=n_doctors).tolist(),
+        )
         
-        # Appointments
-        start_date = datetime.now() - timedelta(days=30)
-        appointments = []
-        for i in range(1, 101):
-            date = start_date + timedelta(days=random.randint(0, 60))
-            appointments.append((
-                i,
-                random.randint(1, 50),  # patient_id
-                random.randint(1, 10),   # doctor_id
-                date.strftime('%Y-%m-%d'),
-                fake.sentence(nb_words=4)
-            ))
+        # Appointments, on days from 30 days ago to 30 days ahead
+        today = date.today()
+        start_date = np.datetime64(today - timedelta(days=30), 'D')
+        dates = start_date + rng.integers(0, 61, size=n_appointments)
+        appointments = zip(
+            range(1, n_appointments + 1),
+            rng.integers(1, n_patients + 1, size=n_appointments).tolist(),  # patient_id
+            rng.integers(1, n_doctors + 1, size=n_appointments).tolist(),   # doctor_id
+            np.datetime_as_string(dates, unit='D').tolist(),
+            pick(sentence_pool, n_appointments),
+        )
         
-        # Insert data
-        conn.executemany("INSERT OR REPLACE INTO patients VALUES (?,?,?,?,?)", patients)
-        conn.executemany("INSERT OR REPLACE INTO doctors VALUES (?,?,?)", doctors)
-        conn.executemany("INSERT OR REPLACE INTO appointments VALUES (?,?,?,?,?)", appointments)
-        
-        conn.commit()
+        # Insert data in a single transaction through one cursor; the row
+        # iterators are zipped lazily, so rows are built as they are inserted
+        cursor = conn.cursor()
+        cursor.execute("BEGIN")
+        cursor.executemany("INSERT OR REPLACE INTO patients VALUES (?,?,?,?,?)", patients)
+        cursor.executemany("INSERT OR REPLACE INTO doctors VALUES (?,?,?)", doctors)
+        cursor.executemany("INSERT OR REPLACE INTO appointments VALUES (?,?,?,?,?)", appointments)
+        cursor.execute(f"PRAGMA user_version = {today.toordinal()}")
+        cursor.execute("COMMIT")
+    
+    return db_path
+
+def install_sample_database(db_path="medical.db"):
+    """Copy the prebuilt sample database into place.
+
+    Appointment dates are shifted by one UPDATE so they stay around today.
+    Falls back to `generate_sample_database` when the seed file is missing.
+    """
+    if not SEED_DB_PATH.exists():
+        return generate_sample_database(db_path)
+    
+    shutil.copyfile(SEED_DB_PATH, db_path)
+    with sqlite3.connect(db_path, isolation_level=None) as conn:
+        built_on = conn.execute("PRAGMA user_version").fetchone()[0]
+        today = date.today().toordinal()
+        if built_on and built_on != today:
+            conn.execute("BEGIN")
+            conn.execute("UPDATE appointments SET date = date(date, ?)", (f"{today - built_on:+d} days",))
+            conn.execute(f"PRAGMA user_version = {today}")
+            conn.execute("COMMIT")
     
     return db_path
 
@@ -98,8 +166,51 @@ def get_db_path():
         return str(db_files[0])
     return None
 
-def execute_query(query):
-    """Execute an SQL query and return the results as a DataFrame."""
+def db_version(db_path):
+    """Return the (mtime, size) of the database file and of its WAL file.
+
+    The pooled connections run in WAL mode, so commits land in the -wal file
+    and leave the main file untouched until a checkpoint; both are needed to
+    tell that the database changed. A missing file counts as None.
+    """
+    version = []
+    for path in (db_path, f"{db_path}-wal"):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            version.append(None)
+        else:
+            version.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(version)
+
+# Distinct (query, parameters) results kept in memory between reruns
+RESULT_CACHE_SIZE = 256
+
+# Rows fetched and shown per query; anything past this is never read
+MAX_RESULT_ROWS = 1000
+
+@st.cache_data(max_entries=RESULT_CACHE_SIZE)
+def _fetch_results(db_path, version, normalized, params, _query):
+    """Run a query and return (columns, rows, truncated).
+
+    Cached on the whitespace-collapsed SQL and its parameters; `_query`, the
+    SQL as written, is what runs and isn't part of the key. The `db_version`
+    in the key drops results once the database changes. Rows are fetched in
+    batches and only up to MAX_RESULT_ROWS, plus one to tell whether there
+    were more.
+    """
+    # Runs on pooled read-only connections, kept across reruns, on which
+    # SQLite itself refuses anything but reads
+    columns, rows = execute_select(db_path, _query, params, max_rows=MAX_RESULT_ROWS + 1)
+    return columns, rows[:MAX_RESULT_ROWS], len(rows) > MAX_RESULT_ROWS
+
+def execute_query(query, params=()):
+    """Execute an SQL query with bound parameters.
+
+    Returns the column names, at most MAX_RESULT_ROWS row tuples, and whether
+    rows past that limit were left out. Rows stay plain tuples; a DataFrame
+    is only built when there are results to show.
+    """
     if not DB_PATH:
         logger.error("Database not found")
         raise Exception("Database not found. Please generate a database first.")
@@ -107,22 +218,27 @@ def execute_query(query):
     try:
         logger.info(f"Executing query: {query}")
         start_time = datetime.now()
-        with sqlite3.connect(DB_PATH) as conn:
-            results = pd.read_sql_query(query, conn)
+        columns, rows, truncated = _fetch_results(DB_PATH, db_version(DB_PATH),
+                                                  " ".join(query.split()), tuple(params), query)
         end_time = datetime.now()
         execution_time = (end_time - start_time).total_seconds()
-        logger.info(f"Query executed successfully in {execution_time:.2f} seconds. Returned {len(results)} rows.")
-        return results
+        logger.info(f"Query executed successfully in {execution_time:.2f} seconds. Returned {len(rows)} rows.")
+        return columns, rows, truncated
     except Exception as e:
         logger.error(f"Query execution error: {str(e)}")
         raise
 
+# Statements the app never runs, as whole words so e.g. "created_at" passes
+_UNSAFE_RE = re.compile(r"\b(?:insert|update|delete|drop|alter|create|pragma|attach|vacuum)\b", re.I)
+
+@st.cache_resource
+def get_converter():
+    """Build the Text2SQL converter once and share it across reruns and sessions."""
+    return Text2SQLModel()
+
 def is_safe_query(query):
     """Basic SQL query safety check."""
-    query = query.lower()
-    if any(word in query for word in ['insert', 'update', 'delete', 'drop', 'alter', 'create']):
-        return False
-    return True
+    return _UNSAFE_RE.search(query) is None
 
 DB_PATH = get_db_path()
 if not DB_PATH:
@@ -204,37 +320,52 @@ h1, h2, h3, h4 {
 </style>
 """, unsafe_allow_html=True)
 
+@st.cache_data
+def _read_sqlite_schema(db_path, version):
+    """Read table and column info from SQLite, cached until `db_version` changes."""
+    with get_pool(db_path).connection() as conn:
+        # Every table's columns in one statement, table by table in cid order
+        rows = conn.execute("""
+            SELECT m.name, p.name, p.type, p."notnull", p.pk
+            FROM sqlite_master m JOIN pragma_table_info(m.name) p
+            WHERE m.type = 'table'
+        """).fetchall()
+    
+    return {
+        table_name: {
+            col_name: {
+                "type": col_type,
+                "nullable": not notnull,
+                "primary_key": bool(pk)
+            }
+            for _, col_name, col_type, notnull, pk in columns
+        }
+        for table_name, columns in itertools.groupby(rows, key=lambda row: row[0])
+    }
+
 def get_sqlite_schema():
     """Get schema directly from SQLite database."""
     if not DB_PATH:
         return {}
     
-    schema = {}
     try:
-        with sqlite3.connect(DB_PATH) as conn:
-            cursor = conn.cursor()
-            # Get all tables
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-            tables = cursor.fetchall()
-            
-            for table in tables:
-                table_name = table[0]
-                cursor.execute(f"PRAGMA table_info({table_name});")
-                columns = cursor.fetchall()
-                # Store column info: name, type, notnull, dflt_value, pk
-                schema[table_name] = {
-                    col[1]: {
-                        "type": col[2],
-                        "nullable": not col[3],
-                        "primary_key": bool(col[5])
-                    }
-                    for col in columns
-                }
+        return _read_sqlite_schema(DB_PATH, db_version(DB_PATH))
     except Exception as e:
         st.sidebar.error(f"Error reading schema: {str(e)}")
         return {}
-    
-    return schema
+
+@st.cache_data
+def _schema_markdown(db_path, version):
+    """Render each table's columns as one markdown block, cached like the schema."""
+    markdown = {}
+    for table, columns in _read_sqlite_schema(db_path, version).items():
+        lines = []
+        for col_name, col_info in columns.items():
+            pk_mark = "🔑 " if col_info["primary_key"] else ""
+            nullable = "nullable" if col_info["nullable"] else "not null"
+            lines.append(f"{pk_mark}{col_name}: {col_info['type']} ({nullable})")
+        markdown[table] = "  \n".join(lines)
+    return markdown
 
 def show_schema():
     """Display the database schema in the sidebar."""
@@ -245,12 +376,9 @@ def show_schema():
         st.sidebar.warning("No schema available. Generate a database first.")
         return
         
-    for table, columns in schema.items():
+    for table, markdown in _schema_markdown(DB_PATH, db_version(DB_PATH)).items():
         with st.sidebar.expander(f"📋 {table}"):
-            for col_name, col_info in columns.items():
-                pk_mark = "🔑 " if col_info["primary_key"] else ""
-                nullable = "nullable" if col_info["nullable"] else "not null"
-                st.write(f"{pk_mark}{col_name}: {col_info['type']} ({nullable})")
+            st.markdown(markdown)
 
 def main():
     # Title and Introduction
@@ -258,25 +386,21 @@ def main():
     
     # Add logging display in sidebar
     with st.sidebar.expander("📊 System Logs", expanded=False):
-        try:
-            with open("logs/query_system.log", "r") as f:
-                logs = f.readlines()[-10:]  # Show last 10 log entries
-                for log in logs:
-                    if "ERROR" in log:
-                        st.error(log.strip())
-                    elif "WARNING" in log:
-                        st.warning(log.strip())
-                    else:
-                        st.text(log.strip())
-        except Exception as e:
-            st.warning(f"Could not load logs: {str(e)}")
+        # The last log entries, kept in memory by the logging setup
+        for log in recent_logs():
+            if "ERROR" in log:
+                st.error(log)
+            elif "WARNING" in log:
+                st.warning(log)
+            else:
+                st.text(log)
     
     # Database Generation Section
     if not DB_PATH:
         st.warning("No database found. Generate a sample database to get started.")
         if st.button("Generate Sample Database"):
             try:
-                db_path = generate_sample_database()
+                db_path = install_sample_database()
                 st.success(f"Sample database generated successfully at {db_path}")
                 st.info("Please restart the application to use the new database.")
                 st.stop()
@@ -317,10 +441,8 @@ def main():
             st.header("2. SQL Translation")
             with st.spinner("Translating to SQL..."):
                 try:
-                    # Create Text2SQL converter
-                    from src.nl_to_sql.text2sql_model import Text2SQLModel
-                    converter = Text2SQLModel()
-                    sql = converter.convert(question)
+                    result = get_converter().convert(question)
+                    sql, params = result if result else (None, ())
                     
                     # Calculate translation time
                     translation_time = (datetime.now() - start_time).total_seconds()
@@ -329,22 +451,32 @@ def main():
                     
                     if sql:
                         st.code(sql, language="sql")
+                        if params:
+                            st.caption(f"Parameters: {params}")
                         
                         # Step 3: Execution
                         st.header("3. Query Results")
                         if is_safe_query(sql):
                             execution_start = datetime.now()
-                            results = execute_query(sql)
+                            columns, rows, truncated = execute_query(sql, params)
                             
                             # Calculate execution time
                             execution_time = (datetime.now() - execution_start).total_seconds()
                             with col2:
                                 st.metric("Execution Time", f"{execution_time:.2f}s")
                             
-                            if not results.empty:
+                            if rows:
                                 with col3:
-                                    st.metric("Results Found", len(results))
-                                st.dataframe(results)
+                                    st.metric("Results Found", len(rows))
+                                if (len(rows) == 1 and len(columns) == 1
+                                        and isinstance(rows[0][0], (int, float, str))):
+                                    # A single number or text, e.g. a COUNT(*), needs no
+                                    # table; st.metric can't show anything else, e.g. BLOBs
+                                    st.metric(columns[0], rows[0][0])
+                                else:
+                                    st.dataframe(pd.DataFrame.from_records(rows, columns=columns))
+                                if truncated:
+                                    st.caption(f"Showing the first {MAX_RESULT_ROWS} rows.")
                             else:
                                 st.info("Query executed successfully but returned no results.")
                                 with col3:
@@ -0,0 +1,33 @@
+"""Shared fixtures: one sample database per test session."""
+import shutil
+import sqlite3
+import sys
+from pathlib import Path
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Tests import the code as the `src` package, like the app does
+sys.path.insert(0, str(ROOT))
+
+# The prebuilt sample database the app installs, see tools/build_seed_db.py
+SEED_DB_PATH = ROOT / "assets" / "medical.seed.db"
+
+
+@pytest.fixture(scope="session")
+def seed_db(tmp_path_factory):
+    """Copy the sample database once for the whole session."""
+    db_path = tmp_path_factory.mktemp("seed") / "seed_medical.db"
+    shutil.copyfile(SEED_DB_PATH, db_path)
+    return db_path
+
+
+@pytest.fixture
+def seed_conn(seed_db):
+    """Give each test its own in-memory copy of the session database."""
+    src = sqlite3.connect(str(seed_db))
+    conn = sqlite3.connect(":memory:")
+    src.backup(conn)
+    src.close()
+    yield conn
+    conn.close()
@@ -1,8 +1,8 @@
 """Test the DB helper functions for sanitization and query execution."""
 import pytest
 import sqlite3
-from db import is_safe_select, execute_select
-from config import DB_PATH
+from src.database.db import is_safe_select, execute_select, execute_select_iter
+from src.config.config import DB_PATH
 
 
 def test_safe_selects():
@@ -63,4 +63,60 @@ def test_execute_select(tmp_path):
         execute_select(str(db), "DELETE FROM test")
     
     with pytest.raises(ValueError):
-        execute_select(str(db), "SELECT * FROM nonexistent")
\ No newline at end of file
+        execute_select(str(db), "SELECT * FROM nonexistent")
+
+
+def test_execute_select_row_limit(tmp_path):
+    """Test that row fetching is capped and that the iterator streams all rows."""
+    db = tmp_path / "test.db"
+    conn = sqlite3.connect(str(db))
+    conn.execute("CREATE TABLE test (id INTEGER PRIMARY KEY)")
+    conn.executemany("INSERT INTO test VALUES (?)", [(i,) for i in range(1, 501)])
+    conn.commit()
+    conn.close()
+
+    cols, rows = execute_select(str(db), "SELECT id FROM test ORDER BY id", max_rows=250)
+    assert cols == ["id"]
+    assert len(rows) == 250
+    assert rows[-1] == (250,)
+
+    assert sum(1 for _ in execute_select_iter(str(db), "SELECT id FROM test")) == 500
+
+
+def test_partial_read_does_not_pin_snapshot(tmp_path):
+    """Test that a result cut short by max_rows doesn't hide later writes."""
+    db = tmp_path / "test.db"
+    conn = sqlite3.connect(str(db))
+    conn.execute("CREATE TABLE test (id INTEGER PRIMARY KEY)")
+    conn.executemany("INSERT INTO test VALUES (?)", [(i,) for i in range(1000)])
+    conn.commit()
+
+    assert len(execute_select(str(db), "SELECT id FROM test", max_rows=10)[1]) == 10
+    rows = execute_select_iter(str(db), "SELECT id FROM test ORDER BY id")
+    assert next(rows) == (0,)
+    rows.close()
+
+    conn.execute("INSERT INTO test VALUES (1000)")
+    conn.commit()
+    conn.close()
+    assert execute_select(str(db), "SELECT COUNT(*) FROM test")[1] == [(1001,)]
+    assert len(execute_select(str(db), "SELECT id FROM test", max_rows=2000)[1]) == 1001
+
+
+def test_execute_select_read_only_authorizer(tmp_path):
+    """Test that SQLite's authorizer, not a keyword scan, decides what may run."""
+    db = tmp_path / "test.db"
+    conn = sqlite3.connect(str(db))
+    conn.execute("CREATE TABLE test (id INTEGER PRIMARY KEY)")
+    conn.execute("INSERT INTO test VALUES (1), (2)")
+    conn.commit()
+    conn.close()
+
+    # CTEs only read, so they are allowed
+    cols, rows = execute_select(str(db), "WITH ids AS (SELECT id FROM test) SELECT COUNT(*) FROM ids")
+    assert rows == [(2,)]
+
+    for sql in ["DELETE FROM test", "PRAGMA table_info(test)", "SELECT 1; DROP TABLE test", "-- comment"]:
+        with pytest.raises(ValueError):
+            execute_select(str(db), sql)
+    assert execute_select(str(db), "SELECT COUNT(*) FROM test")[1] == [(2,)]
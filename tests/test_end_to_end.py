@@ -2,14 +2,14 @@
 import os
 import pytest
 import sqlite3
-from generate_data import generate
-from text2sql_model import Text2SQLModel
-from db import execute_select
+from src.nl_to_sql.text2sql_model import Text2SQLModel
+from src.database.db import execute_select
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def test_db(tmp_path_factory):
-    """Create a small test database for all tests."""
+    """Create a small test database once for the session."""
+    generate = pytest.importorskip("generate_data").generate
     tmp_dir = tmp_path_factory.mktemp("data")
     db_path = str(tmp_dir / "test_medical.db")
     
@@ -29,7 +29,7 @@ def test_db(tmp_path_factory):
 @pytest.fixture
 def model():
     """Create Text2SQLModel with schema."""
-    from config import SCHEMA
+    from src.config.config import SCHEMA
     return Text2SQLModel(schema=SCHEMA)
 
 
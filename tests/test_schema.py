@@ -0,0 +1,20 @@
+"""Test that the precomputed schema SQL matches schema.json."""
+import sqlite3
+from src.database.schema import SCHEMA_SQL, _build_schema_sql, create_schema
+
+
+def test_schema_sql_is_up_to_date():
+    """Test that schema_sql.py was regenerated after the last schema.json edit."""
+    assert SCHEMA_SQL == _build_schema_sql(), "run tools/gen_schema.py"
+
+
+def test_create_schema_is_idempotent():
+    """Test that creating the schema twice leaves one copy of every table."""
+    conn = sqlite3.connect(":memory:")
+    create_schema(conn)
+    create_schema(conn)
+    cur = conn.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")
+    assert [row[0] for row in cur] == sorted(
+        ["patients", "doctors", "medications", "appointments", "prescriptions"]
+    )
+    conn.close()
@@ -1,6 +1,6 @@
 """Test the rule-based text-to-SQL translator (fallback without model)."""
 import pytest
-from text2sql_model import Text2SQLModel
+from src.nl_to_sql.text2sql_model import Text2SQLModel
 
 
 @pytest.fixture
@@ -0,0 +1,187 @@
+"""Test rule dispatch in the rule-based text-to-SQL converter."""
+from datetime import date
+import pytest
+from src.nl_to_sql.text2sql_model import Text2SQLModel, _get_nlp, _literal_texts, _months_before
+
+
+@pytest.fixture(scope="module")
+def model():
+    """Create a Text2SQLModel instance shared by the tests."""
+    return Text2SQLModel()
+
+
+def test_rule_receives_captured_groups(model):
+    """Test that a matched rule builds its SQL from the captured values."""
+    sql, params = model.convert("Show doctors having more than 3 appointments")
+    assert "HAVING COUNT(a.appointment_id) > ?" in sql
+    assert params == (3,)
+
+
+def test_first_matching_rule_wins(model):
+    """Test that rules are tried in their declared order."""
+    sql, _ = model.convert("Show doctors who have the most appointments")
+    assert "DoctorStats" in sql
+    assert "LIMIT 5" in sql
+
+
+def test_rule_queries_do_not_load_spacy(model):
+    """Test that queries answered by the rules never load the spaCy model."""
+    _get_nlp.cache_clear()
+    model.convert("How many patients do we have?")
+    model.convert("List patients with blood type A+")
+    assert _get_nlp.cache_info().currsize == 0
+
+
+def test_extract_entities_without_spacy(model):
+    """Test that names, dates and gender are found by the regex extractor."""
+    entities = model._extract_entities("How many appointments did Dr. Smith have in 2023")
+    assert entities["persons"] == [{"name": "Smith", "is_doctor": True}]
+    assert entities["dates"] == ["2023"]
+    assert entities["gender"] is None
+
+    entities = model._extract_entities("List female patients of John Doe")
+    assert entities["persons"] == [{"name": "John Doe", "is_doctor": False}]
+    assert entities["gender"] == "F"
+
+    entities = model._extract_entities("Patients with AB+ or o-, not C+")
+    assert entities["blood_types"] == ["AB+", "O-"]
+
+
+def test_literal_patterns_use_exact_lookup(model):
+    """Test that only plain ^literal$ patterns, optional letters expanded, become dict keys."""
+    assert _literal_texts(r"^how many doctors are there\?$") == ("how many doctors are there?",)
+    assert _literal_texts(r"^show all patients?$") == ("show all patient", "show all patients")
+    assert _literal_texts(r"^show (\d+) patients$") is None
+    assert model.convert("list all doctor and their specialties") == model.convert("list all doctors and their specialties")
+    sql, params = model.convert("How many doctors are there?")
+    assert "COUNT" in sql.upper() and "doctors" in sql
+    assert params == ()
+
+
+def test_rule_sql_binds_values_per_query(model):
+    """Test that rule SQL keeps its placeholders and binds each question's values."""
+    sql, params = model.convert("Show all patients older than 60")
+    assert "age > ?" in sql
+    assert params == (60,)
+    assert "{" not in sql
+    assert model.convert("Show all patients older than 45") == (sql, (45,))
+    assert model.convert("Show all patients")[1] == ()
+
+
+def test_values_are_bound_not_interpolated(model):
+    """Test that names taken from the question never end up in the SQL text."""
+    sql, params = model.convert("Show appointments for patient John Doe")
+    assert "john doe" not in sql.lower()
+    assert params == ("john doe",)
+
+
+def test_whitespace_does_not_change_the_answer(model):
+    """Test that repeating a question with other spacing gives the same answer."""
+    first = model.convert("Show all patients older than 60")
+    assert model.convert("  Show all patients older than 60 ") == first
+    assert model.convert("Show  all\tpatients older   than 60") == first
+
+
+def test_case_does_not_change_the_answer(model):
+    """Test that questions differing only in case give the same SQL and params."""
+    sql, params = model.convert("List patients with blood type A+")
+    assert model.convert("LIST PATIENTS WITH BLOOD TYPE A+") == (sql, params)
+    assert model.convert("list patients with blood type a+") == (sql, params)
+    assert params == ("A+",)
+
+
+def test_month_filters_use_calendar_months(model):
+    """Test that month and year filters step back whole calendar months."""
+    assert _months_before(date(2024, 3, 31), 1) == date(2024, 2, 29)
+    assert _months_before(date(2024, 1, 15), 1) == date(2023, 12, 15)
+    assert _months_before(date(2024, 2, 29), 12) == date(2023, 2, 28)
+    assert model._get_date_filter("a", "month") is model._get_date_filter("1", "months")
+
+
+def test_terms_resolve_to_tables(model):
+    """Test that word variations map back to their table names."""
+    assert model._terms_in("how many physicians saw people?") == {"doctor", "patient"}
+    assert model._is_medication_query("drugs prescribed last week")
+    assert model.convert("What is the meaning of life?") is None
+
+
+def test_anchored_rules_match_whole_text(model):
+    """Test that ^...$ rules only fire when they cover the whole question."""
+    assert model._combined.match("show all patients").lastgroup == "all_patients"
+    match = model._combined.match("show all patients with appointments")
+    assert match is None or match.lastgroup != "all_patients"
+
+
+def test_keyword_prefilter_keeps_matching_rule(model):
+    """Test that the prefilter drops unrelated rules but keeps the winner."""
+    names = [name for name, _ in model._candidate_rules("show appointments for dr. smith")]
+    assert "doctor_appointments" in names
+    assert "all_patients" not in names
+    assert model._candidate_rules("hello there") == ()
+
+
+def test_blood_type_phrasings_share_one_pattern(model):
+    """Test that the word before the blood type picks the template."""
+    assert model._match_blood_type_query("list patients with blood type a+") == ("patients_by_blood", "A+")
+    assert model._match_blood_type_query("patients with type ab+") == ("patients_by_blood", "AB+")
+    assert model._match_blood_type_query("blood group b-") == ("blood_type", "B-")
+    assert model._match_blood_type_query("patients of o+") == ("patient_blood_type", "O+")
+    assert model._match_blood_type_query("list of o+") is None
+
+
+def test_convert_batch_matches_convert(model):
+    """Test that batch conversion gives the per-question results in order."""
+    questions = ["Show all patients", "List patients with blood type A+", "hello there"]
+    assert model.convert_batch(questions) == [model.convert(q) for q in questions]
+
+
+def test_rules_compile_once_per_process(model):
+    """Test that a second model reuses the compiled rule regex."""
+    assert Text2SQLModel()._combined is model._combined
+
+
+def test_questions_with_same_keywords_bind_their_own_values(model):
+    """Test that questions routed the same way still get their own parameters."""
+    smith_sql, smith_params = model.convert("show appointments for dr. smith")
+    jones_sql, jones_params = model.convert("show appointments for dr. jones")
+    assert smith_sql == jones_sql
+    assert (smith_params, jones_params) == (("smith",), ("jones",))
+    assert model.convert("hello there") is None
+
+
+def test_unroutable_questions_skip_spacy():
+    """Test that spaCy is not loaded for questions no query builder handles."""
+    model = Text2SQLModel(use_spacy=True)
+    _get_nlp.cache_clear()
+    assert model.convert("What is the meaning of life?") is None
+    assert _get_nlp.cache_info().currsize == 0
+
+
+def test_entity_queries_bind_names_and_dates(model):
+    """Test that the entity fallback passes names and dates as parameters."""
+    sql, params = model.convert("Show visits of John Smith in 2023")
+    assert "p.name LIKE '%' || ? || '%'" in sql
+    assert "a.date LIKE ? || '%'" in sql
+    assert params == ("John Smith", "2023")
+
+
+def test_medication_query_uses_fixed_joins(model):
+    """Test that medication questions build their joins without a schema lookup."""
+    sql, params = model.convert("How many drugs were prescribed to Jane Roe")
+    assert "JOIN medications m ON p.med_id = m.med_id" in sql
+    assert params == ("Jane Roe",)
+
+
+@pytest.mark.parametrize("question", [
+    "show me everything",
+    "list everything",
+    "show the prescriptions table",
+    # "list" and "show" inside other words route to the entity fallback too
+    "is the slideshow playlist ready",
+    "Show me what is listed for Anna Smith",
+    "LIST EVERY TABLE",
+])
+def test_show_and_list_questions_never_raise(model, question):
+    """Test that open show/list questions give None or a SELECT, never an error."""
+    result = model.convert(question)
+    assert result is None or result[0].startswith("SELECT")
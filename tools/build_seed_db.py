@@ -0,0 +1,24 @@
+"""Rebuild assets/medical.seed.db, the sample database the app copies into place.
+
+Run after changing generate_sample_database in streamlit_app.py:
+
+    python tools/build_seed_db.py
+"""
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from streamlit_app import SEED_DB_PATH, generate_sample_database  # noqa: E402
+
+
+def main() -> int:
+    SEED_DB_PATH.unlink(missing_ok=True)
+    generate_sample_database(str(SEED_DB_PATH))
+    print(f"wrote {SEED_DB_PATH.relative_to(ROOT)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,47 @@
+"""Regenerate src/database/schema_sql.py from data/schema.json.
+
+Run after editing schema.json:
+
+    python tools/gen_schema.py          # rewrite schema_sql.py
+    python tools/gen_schema.py --check  # exit 1 if schema_sql.py is stale
+"""
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from src.database.schema import _build_schema_sql  # noqa: E402
+
+OUTPUT = ROOT / "src" / "database" / "schema_sql.py"
+
+HEADER = '''"""CREATE TABLE statements for the medical schema.
+
+Generated by tools/gen_schema.py from data/schema.json -- do not edit by hand.
+"""
+'''
+
+
+def render() -> str:
+    """Render the schema_sql.py module source."""
+    lines = [HEADER, "SCHEMA_SQL = ("]
+    lines.extend(f"    {stmt!r}," for stmt in _build_schema_sql())
+    lines.append(")")
+    return "\n".join(lines) + "\n"
+
+
+def main(argv) -> int:
+    source = render()
+    if "--check" in argv:
+        current = OUTPUT.read_text() if OUTPUT.exists() else ""
+        if current != source:
+            print(f"{OUTPUT.relative_to(ROOT)} is out of date; run tools/gen_schema.py")
+            return 1
+        return 0
+    OUTPUT.write_text(source)
+    print(f"Wrote {OUTPUT.relative_to(ROOT)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))